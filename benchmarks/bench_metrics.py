@@ -0,0 +1,81 @@
+"""
+Compara o cálculo antigo dos indicadores (filtro por moeda + iloc e apply
+linha a linha no e-mail) com o compute_metrics/email_table vetorizados.
+
+    python benchmarks/bench_metrics.py [registros]
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cotacao_bot"))
+from metrics import compute_metrics, email_table
+from schema import CURRENCIES, to_canonical
+
+
+def make_frame(n):
+    rng = np.random.default_rng(0)
+    per_currency = n // len(CURRENCIES)
+    times = pd.date_range("2015-01-02 10:00", periods=per_currency, freq="37min")
+    frames = [
+        pd.DataFrame({
+            "cotacaoCompra": 5 + rng.standard_normal(per_currency).cumsum() / 100,
+            "cotacaoVenda": 5.0006 + rng.standard_normal(per_currency).cumsum() / 100,
+            "dataHoraCotacao": times,
+            "Moeda": code,
+        })
+        for code in CURRENCIES
+    ]
+    return to_canonical(pd.concat(frames, ignore_index=True))
+
+
+def legacy(df, codes):
+    latest_df = df.sort_values("dataHoraCotacao").groupby("Moeda", observed=True).last().reset_index()
+    latest_df["Data/Hora"] = latest_df["dataHoraCotacao"].dt.strftime("%d/%m/%Y %H:%M")
+    latest_df = latest_df.rename(columns={"cotacaoCompra": "Compra (R$)", "cotacaoVenda": "Venda (R$)"})
+    metrics_data = []
+    for c in codes:
+        subset = df[df["Moeda"] == c]
+        if not subset.empty:
+            latest = subset.iloc[-1]
+            first = subset.iloc[0]
+            metrics_data.append({
+                "Moeda": c,
+                "Compra_Inicial": first["cotacaoCompra"],
+                "Compra_Final": latest["cotacaoCompra"],
+                "Compra_Var": (latest["cotacaoCompra"] - first["cotacaoCompra"]) / first["cotacaoCompra"] * 100,
+                "Venda_Inicial": first["cotacaoVenda"],
+                "Venda_Final": latest["cotacaoVenda"],
+                "Venda_Var": (latest["cotacaoVenda"] - first["cotacaoVenda"]) / first["cotacaoVenda"] * 100,
+                "Compra_Min": subset["cotacaoCompra"].min(),
+                "Compra_Max": subset["cotacaoCompra"].max(),
+                "Venda_Min": subset["cotacaoVenda"].min(),
+                "Venda_Max": subset["cotacaoVenda"].max(),
+            })
+    metrics_df = pd.DataFrame(metrics_data)
+    email_df = latest_df[["Moeda", "Data/Hora", "Compra (R$)", "Venda (R$)"]].copy()
+    email_df["Variação (%)"] = email_df.apply(
+        lambda row: ((row["Compra (R$)"] - metrics_df[metrics_df["Moeda"] == row["Moeda"]]["Compra_Inicial"].values[0]) /
+                     metrics_df[metrics_df["Moeda"] == row["Moeda"]]["Compra_Inicial"].values[0]) * 100,
+        axis=1
+    )
+    return metrics_df, email_df
+
+
+def vectorized(df):
+    metrics_df = compute_metrics(df)
+    return metrics_df, email_table(metrics_df)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = make_frame(n)
+    runs = 5
+    t_old = timeit.timeit(lambda: legacy(df, CURRENCIES), number=runs) / runs
+    t_new = timeit.timeit(lambda: vectorized(df), number=runs) / runs
+    print(f"{len(df)} cotações, {len(CURRENCIES)} moedas")
+    print(f"antigo      {t_old * 1000:9.1f} ms")
+    print(f"vetorizado  {t_new * 1000:9.1f} ms   ({t_old / t_new:.1f}x)")
@@ -0,0 +1,137 @@
+"""
+Compara, no tamanho real de página do cliente (PAGE_SIZE registros), a
+decodificação de uma página OData por três caminhos, em tempo médio por
+página e pico de memória:
+
+- r.json() + pd.DataFrame(lista de dicts), o caminho original;
+- r.json() + decode_page (colunas tipadas), o caminho atual;
+- leitura incremental com JSONDecoder.raw_decode em colunas tipadas,
+  avaliada e descartada (mantida aqui só para conferir a comparação).
+
+    python benchmarks/bench_odata_decode.py [páginas]
+"""
+import codecs
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from array import array
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cotacao_bot"))
+from olinda import PAGE_SIZE, decode_page
+
+BOLETINS = ["Abertura", "Intermediário", "Intermediário", "Intermediário", "Fechamento PTAX"]
+CHUNK_SIZE = 64 * 1024
+
+
+def make_payload(n):
+    records = [
+        {
+            "paridadeCompra": 1.0,
+            "paridadeVenda": 1.0,
+            "cotacaoCompra": 5.0 + (i % 1000) / 10000,
+            "cotacaoVenda": 5.0006 + (i % 1000) / 10000,
+            "dataHoraCotacao": f"2015-01-02 {10 + i % 5:02d}:{i % 60:02d}:27.{i % 1000:03d}",
+            "tipoBoletim": BOLETINS[i % 5],
+        }
+        for i in range(n)
+    ]
+    return json.dumps({"@odata.context": "https://olinda.bcb.gov.br/$metadata", "value": records}).encode()
+
+
+def iter_records(chunks):
+    """Registros do array "value" lidos em pedaços com raw_decode (descartado)"""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buf, pos = "", 0
+
+    def more():
+        nonlocal buf, pos
+        for chunk in chunks:
+            text = utf8.decode(chunk)
+            if text:
+                if pos > 1024 * 1024:
+                    buf, pos = buf[pos:], 0
+                buf += text
+                return True
+        return False
+
+    while True:
+        start = buf.find('"value"', pos)
+        bracket = buf.find("[", start) if start >= 0 else -1
+        if bracket >= 0:
+            pos = bracket + 1
+            break
+        if not more():
+            return
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            if not more():
+                raise ValueError("Resposta OData truncada")
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if not more():
+                raise
+            continue
+        pos = end
+        yield record
+
+
+def streaming_columns(payload):
+    columns, n = {}, 0
+    chunks = (payload[i:i + CHUNK_SIZE] for i in range(0, len(payload), CHUNK_SIZE))
+    for record in iter_records(chunks):
+        for key, value in record.items():
+            col = columns.get(key)
+            if col is None:
+                is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                col = columns[key] = array("d", [np.nan] * n) if is_number else [None] * n
+            col.append(np.nan if value is None and isinstance(col, array) else value)
+        n += 1
+    data = {k: np.frombuffer(c, dtype=np.float64) if isinstance(c, array) else np.array(c, dtype=object)
+            for k, c in columns.items()}
+    return pd.DataFrame(data, copy=False)
+
+
+def original_path(payload):
+    return pd.DataFrame(json.loads(payload).get("value", []))
+
+
+def current_path(payload):
+    # O mesmo caminho de _request_page: r.json() seguido de decode_page
+    return decode_page(json.loads(payload))[0]
+
+
+def measure(func, payload, pages):
+    elapsed = timeit.timeit(lambda: func(payload), number=pages) / pages
+    tracemalloc.start()
+    df = func(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(df)
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    payload = make_payload(PAGE_SIZE)
+    print(f"{pages} páginas de {PAGE_SIZE} registros, {len(payload) / 1024:.0f} KB de JSON cada")
+    paths = [
+        ("r.json() + DataFrame", original_path),
+        ("r.json() + decode_page", current_path),
+        ("raw_decode (descartado)", streaming_columns),
+    ]
+    for name, func in paths:
+        elapsed, peak, rows = measure(func, payload, pages)
+        print(f"{name:<24} {elapsed * 1000:8.2f} ms por página   pico {peak / 1024 ** 2:6.1f} MB   {rows} linhas")
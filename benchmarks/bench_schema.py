@@ -0,0 +1,53 @@
+"""
+Compara o frame de cotações no formato antigo (Moeda e Dia como object)
+com o esquema canônico do schema.py: memória e tempo do groupby diário.
+
+    python benchmarks/bench_schema.py [registros]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cotacao_bot"))
+from schema import CURRENCIES, to_canonical
+
+AGG = {
+    "cotacaoCompra": ["first", "last", "min", "max", "mean"],
+    "cotacaoVenda": ["first", "last", "min", "max", "mean"]
+}
+
+
+def make_legacy(n):
+    rng = np.random.default_rng(0)
+    per_currency = n // len(CURRENCIES)
+    times = pd.date_range("2015-01-02 10:00", periods=per_currency, freq="37min")
+    frames = []
+    for code in CURRENCIES:
+        df = pd.DataFrame({
+            "cotacaoCompra": 5 + rng.standard_normal(per_currency).cumsum() / 100,
+            "cotacaoVenda": 5.0006 + rng.standard_normal(per_currency).cumsum() / 100,
+            "dataHoraCotacao": times,
+            "tipoBoletim": rng.choice(["Abertura", "Intermediário", "Fechamento"], per_currency),
+        })
+        df["Moeda"] = code
+        df["Dia"] = df["dataHoraCotacao"].dt.date
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def groupby_time(df, observed):
+    start = time.perf_counter()
+    df.groupby(["Moeda", "Dia"], observed=observed).agg(AGG)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    legacy = make_legacy(n)
+    canonical = to_canonical(legacy.copy())
+    for name, df in [("antigo (object)", legacy), ("canônico", canonical)]:
+        mb = df.memory_usage(deep=True).sum() / 1024 ** 2
+        print(f"{name:<16} {mb:8.1f} MB   groupby diário {groupby_time(df, True):7.3f} s")
@@ -1,17 +1,31 @@
 import streamlit as st
 import pandas as pd
-import requests
 from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
-import pythoncom
-import win32com.client as win32
-import threading
 import time
-from datetime import datetime, time as dt_time
-from schedule import Scheduler
+from olinda import fetch_many
+from cross_rates import CrossRates
+from daily import daily_aggregates
+from downsample import CHART_WIDTH_PX, METHODS as DOWNSAMPLE_METHODS, WEBGL_THRESHOLD, decimate
+from export import FORMATS as EXPORT_FORMATS, export_cache
+from figure_cache import figure_store
+from frame_cache import cached, data_cache
+from quote_cache import TODAY_TTL, quote_cache
+from rollups import LEVELS as ROLLUP_LEVELS, rollups
+from indicators import INDICATORS, PERIODS_PER_YEAR, indicator_engine
+from mail_queue import mail_queue
+from mailer import render_report
+from metrics import compute_metrics, email_table
+from panel import GRIDS as PANEL_GRIDS, aligned_panel, pair_series, rolling_cov_corr
+from poller import POLL_SECONDS, poller
+import reports  # registra a tarefa das assinaturas no agendador
+from scheduler import DAILY_EMAIL_CRON, scheduler
+from subscriptions import PERIOD_DAYS, REPORTS, SUBSCRIPTION_REPORT, subscriptions
+from schema import CURRENCIES
+from table_view import PAGE_SIZES, filter_rows, page_count, page_rows
 
 # — Page configuration —
 st.set_page_config(
@@ -21,6 +35,25 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# — Medição de tempo por execução (script completo ou fragmento) —
+run_started = time.perf_counter()
+if "timings" not in st.session_state:
+    st.session_state.timings = {}
+
+def timed(name):
+    """Registra em st.session_state.timings a duração (ms) da última execução"""
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                st.session_state.timings[name] = (time.perf_counter() - started) * 1000
+        wrapper.__name__ = func.__name__
+        wrapper.__qualname__ = func.__qualname__
+        return wrapper
+    return decorator
+
 # — Custom CSS for enhanced styling —
 st.markdown("""
 <style>
@@ -101,181 +134,73 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # — Data fetching functions —
-@st.cache_data(ttl=3600, show_spinner="Carregando dados do BCB...")
 def get_currency_data(code, start_date, end_date):
-    fmt = "%m-%d-%Y"
-    base = "https://olinda.bcb.gov.br/olinda/servico/PTAX/versao/v1/odata/"
-    params = {
-        "@dataInicial": f"'{start_date.strftime(fmt)}'",
-        "@dataFinalCotacao": f"'{end_date.strftime(fmt)}'",
-        "$format": "json"
-    }
-    endpoint = "CotacaoDolarPeriodo" if code == "USD" else "CotacaoMoedaPeriodo"
-    if code != "USD":
-        params["@moeda"] = f"'{code}'"
-    url = f"{base}{endpoint}("
-    if code == "USD":
-        url += "dataInicial=@dataInicial,dataFinalCotacao=@dataFinalCotacao"
-    else:
-        url += "moeda=@moeda,dataInicial=@dataInicial,dataFinalCotacao=@dataFinalCotacao"
-    url += ")?" + "&".join(f"{k}={v}" for k, v in params.items())
+    # Cache por intervalos de dias sobre o armazenamento local; só as lacunas são buscadas
     try:
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
-        data = r.json().get("value", [])
-        if data:
-            df = pd.DataFrame(data)
-            df["Moeda"] = code
-            df["dataHoraCotacao"] = pd.to_datetime(df["dataHoraCotacao"])
-            df["Dia"] = df["dataHoraCotacao"].dt.date
-            return df
-        return pd.DataFrame()
+        return quote_cache.get(code, start_date, end_date)
     except Exception as e:
         st.error(f"Erro ao buscar dados para {code}: {str(e)}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=3600)
-def load_data(codes, start_date, end_date):
-    frames = []
-    for c in codes:
-        dfc = get_currency_data(c, start_date, end_date)
-        if not dfc.empty:
-            frames.append(dfc)
+# O TTL curto só afeta o frame derivado; os dias encerrados ficam no quote_cache.
+# `version` (quote_cache.version) entra na chave: boletins novos geram uma carga nova
+@cached(data_cache, ttl=TODAY_TTL)
+def load_data(codes, start_date, end_date, version):
+    # Busca as moedas em paralelo sobre a sessão HTTP compartilhada
+    results, errors = fetch_many(quote_cache.get, codes, start_date, end_date)
+    for c, e in errors.items():
+        st.error(f"Erro ao buscar dados para {c}: {str(e)}")
+    frames = [results[c] for c in codes if c in results and not results[c].empty]
     if frames:
         df = pd.concat(frames, ignore_index=True)
-        # Calculate daily statistics
-        daily_stats = df.groupby(["Moeda", "Dia"]).agg({
-            "cotacaoCompra": ["first", "last", "min", "max", "mean"],
-            "cotacaoVenda": ["first", "last", "min", "max", "mean"]
-        }).reset_index()
-        daily_stats.columns = ["Moeda", "Dia", 
-                              "Compra_Inicial", "Compra_Final", "Compra_Min", "Compra_Max", "Compra_Media",
-                              "Venda_Inicial", "Venda_Final", "Venda_Min", "Venda_Max", "Venda_Media"]
-        # Calculate variations
-        for t in ["Compra", "Venda"]:
-            daily_stats[f"{t}_Var_Dia"] = ((daily_stats[f"{t}_Final"] - daily_stats[f"{t}_Inicial"]) / 
-                                         daily_stats[f"{t}_Inicial"]) * 100
-            daily_stats[f"{t}_Var_Max"] = ((daily_stats[f"{t}_Max"] - daily_stats[f"{t}_Inicial"]) / 
-                                         daily_stats[f"{t}_Inicial"]) * 100
-            daily_stats[f"{t}_Var_Min"] = ((daily_stats[f"{t}_Min"] - daily_stats[f"{t}_Inicial"]) / 
-                                         daily_stats[f"{t}_Inicial"]) * 100
+        # Estatísticas diárias mantidas incrementalmente a cada carga do quote_cache
+        daily_stats = daily_aggregates.get(codes, start_date, end_date)
         return df, daily_stats
     return pd.DataFrame(), pd.DataFrame()
 
+@cached(data_cache, ttl=TODAY_TTL)
+def rolling_correlation(codes, start_date, end_date, version, quote_type, grid, window):
+    """Correlação/covariância móveis do painel alinhado, calculadas uma vez por janela"""
+    df, daily_stats = load_data(codes, start_date, end_date, version)
+    panel = aligned_panel(df, daily_stats, quote_type, grid)
+    dates, cov, corr = rolling_cov_corr(panel, window)
+    return list(panel.columns), dates, cov, corr
+
+@cached(data_cache, ttl=TODAY_TTL)
+def cross_rates(codes, start_date, end_date, version, grid):
+    """Taxas cruzadas do painel alinhado; os pares são materializados sob demanda"""
+    df, daily_stats = load_data(codes, start_date, end_date, version)
+    return CrossRates.from_quotes(df, daily_stats, grid)
+
 def send_email(df, to_email, subject, analysis_text=""):
-    if df.empty:
-        return False
-    
-    # Create styled HTML table
-    html = df.to_html(
-        index=False, border=0, justify="center",
-        classes="table table-striped table-bordered",
-        formatters={
-            "Compra (R$)": lambda x: f"R$ {x:.4f}",
-            "Venda (R$)": lambda x: f"R$ {x:.4f}",
-            "Variação (%)": lambda x: f"{x:.2f}%"
-        }
-    )
-    
-    body = f"""
-    <html>
-    <head>
-    <style>
-      body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-      .container {{ max-width: 900px; margin: 0 auto; padding: 20px; }}
-      h1 {{ color: #2c3e50; border-bottom: 2px solid #4CAF50; padding-bottom: 10px; }}
-      .table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-      .table th {{ background-color: #4CAF50; color: white; padding: 10px; text-align: left; }}
-      .table td {{ padding: 8px; border: 1px solid #ddd; }}
-      .table tr:nth-child(even) {{ background-color: #f2f2f2; }}
-      .analysis {{ background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin-top: 20px; }}
-      .footer {{ margin-top: 30px; font-size: 0.8em; color: #777; text-align: center; }}
-      .positive {{ color: #28a745; font-weight: bold; }}
-      .negative {{ color: #dc3545; font-weight: bold; }}
-    </style>
-    </head>
-    <body>
-    <div class="container">
-      <h1>📊 Relatório de Cotações PTAX</h1>
-      <h2>{subject}</h2>
-      {html}
-      <div class="analysis">
-        <h3>Análise</h3>
-        <p>{analysis_text}</p>
-      </div>
-      <div class="footer">
-        <p>Relatório gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>
-      </div>
-    </div>
-    </body>
-    </html>
     """
+    Renderiza o relatório uma vez e o enfileira para um ou vários
+    destinatários; o envio acontece no worker da fila, sem bloquear a sessão.
+    """
+    if df.empty:
+        return None
     
+    recipients = [to_email] if isinstance(to_email, str) else list(to_email)
+    return mail_queue.submit(recipients, subject, render_report(df, subject, analysis_text))
+
+# --- Envio Automático: jobs persistentes no agendador único do processo ---
+scheduler.start()
+
+def subscribe_report(codes, side):
+    """Cria a assinatura do destinatário (vale para todas as sessões)"""
     try:
-        pythoncom.CoInitialize()
-        mail = win32.Dispatch("outlook.application").CreateItem(0)
-        mail.To = to_email
-        mail.Subject = subject
-        mail.HTMLBody = body
-        mail.Send()
-        return True
-    except Exception as e:
-        st.error(f"Erro ao enviar e-mail: {str(e)}")
-        return False
-    finally:
-        pythoncom.CoUninitialize()
-# --- Funções de Envio Automático ---
-def prepare_email_data():
-    """Prepara os dados para o e-mail diário"""
-    # Use seu dataframe existente ou crie um específico
-    email_df = latest_df[["Moeda", "Data/Hora", "Compra (R$)", "Venda (R$)"]].copy()
-    email_df["Variação (%)"] = email_df.apply(
-        lambda row: ((row["Compra (R$)"] - metrics_df[metrics_df["Moeda"] == row["Moeda"]]["Compra_Inicial"].values[0]) / 
-                   metrics_df[metrics_df["Moeda"] == row["Moeda"]]["Compra_Inicial"].values[0]) * 100,
-        axis=1
-    )
-    return email_df
-
-def send_daily_email():
-    """Função que será chamada diariamente"""
-    if st.session_state.auto_email_enabled and st.session_state.email_to:
-        try:
-            email_df = prepare_email_data()
-            send_email(
-                email_df, 
-                st.session_state.email_to, 
-                f"Relatório Diário PTAX - {datetime.now().strftime('%d/%m/%Y')}",
-                "Relatório automático de cotações PTAX"
-            )
-            st.success(f"E-mail enviado automaticamente em {datetime.now().strftime('%H:%M')}")
-        except Exception as e:
-            st.error(f"Erro no envio automático: {str(e)}")
-
-def email_scheduler():
-    """Roda em segundo plano verificando o horário"""
-    while st.session_state.get('auto_email_enabled', False):
-        now = datetime.now().time()
-        target_time = dt_time(9, 0)  # 9:00 AM (ajuste conforme necessário)
-        
-        if now.hour == target_time.hour and now.minute == target_time.minute:
-            send_daily_email()
-            time.sleep(61)  # Evita múltiplos envios no mesmo minuto
-        else:
-            time.sleep(30)  # Verifica a cada 30 segundos
+        subscriptions.subscribe(
+            st.session_state.email_to,
+            st.session_state.email_report,
+            codes,
+            side,
+            PERIOD_DAYS[st.session_state.email_period],
+            st.session_state.email_cron
+        )
+        st.session_state.pop("auto_email_error", None)
+    except ValueError as e:
+        st.session_state.auto_email_error = str(e)
 
-def toggle_auto_email():
-    """Alterna o envio automático"""
-    if 'auto_email_enabled' not in st.session_state:
-        st.session_state.auto_email_enabled = False
-    
-    if st.session_state.auto_email_enabled:
-        st.session_state.auto_email_enabled = False
-        st.success("Envio automático DESATIVADO")
-    else:
-        st.session_state.auto_email_enabled = True
-        thread = threading.Thread(target=email_scheduler, daemon=True)
-        thread.start()
-        st.success("Envio automático ATIVADO - E-mails serão enviados às 9:00 AM")
 # — Sidebar controls —
 st.sidebar.header("⚙️ Configurações")
 today = datetime.now().date()
@@ -300,7 +225,7 @@ with st.sidebar.expander("🔍 Filtros de Período", expanded=True):
         date_range = st.date_input(
             "Selecionar período",
             [today - timedelta(days=7), today],
-            min_value=today - timedelta(days=365),
+            min_value=today - timedelta(days=365 * 20),
             max_value=today
         )
         if len(date_range) == 2:
@@ -309,7 +234,7 @@ with st.sidebar.expander("🔍 Filtros de Período", expanded=True):
             start_date = end_date = date_range[0]
 
 with st.sidebar.expander("💰 Moedas", expanded=True):
-    available_currencies = ["USD", "EUR", "GBP", "JPY", "CHF", "AUD", "CAD"]
+    available_currencies = CURRENCIES
     codes = st.multiselect(
         "Selecione as moedas",
         available_currencies,
@@ -327,9 +252,10 @@ with st.sidebar.expander("📊 Opções de Análise", expanded=True):
     
     analysis_level = st.radio(
         "Nível de análise",
-        ["Diário", "Intradiário"],
+        ["Diário", "Intradiário"] + list(ROLLUP_LEVELS),
         index=0,
-        help="Diário: análise por dia. Intradiário: análise por horário dentro do dia."
+        help="Diário: análise por dia. Intradiário: análise por horário dentro do dia. "
+             "Semanal/Mensal/Trimestral/Anual: agregações pré-calculadas, indicadas para períodos longos."
     )
     
     show_benchmark = st.checkbox(
@@ -337,282 +263,339 @@ with st.sidebar.expander("📊 Opções de Análise", expanded=True):
         True,
         help="Mostrar o dólar como referência em gráficos comparativos"
     )
-# Na sidebar (após os controles existentes)
-st.sidebar.markdown("---")
-st.sidebar.subheader("🔔 Envio Automático")
+# Na sidebar (após os controles existentes); fragmento: editar o e-mail não reexecuta o dashboard
+@st.fragment
+def render_auto_email_settings():
+    st.markdown("---")
+    st.subheader("🔔 Envio Automático")
 
-# Email destination (persistente entre execuções)
-if 'email_to' not in st.session_state:
-    st.session_state.email_to = ""
-    
-st.session_state.email_to = st.sidebar.text_input(
-    "E-mail para envio automático",
-    st.session_state.email_to
-)
+    # Assinatura: relatório sobre as moedas e o tipo de cotação selecionados
+    email_to = st.text_input("E-mail para envio automático", key="email_to")
+    st.selectbox("Relatório", REPORTS, key="email_report")
+    st.selectbox(
+        "Período",
+        list(PERIOD_DAYS),
+        key="email_period",
+        help="Janela do relatório de indicadores; a média mensal usa o mês corrente"
+    )
+    st.text_input(
+        "Agendamento (cron)",
+        DAILY_EMAIL_CRON,
+        key="email_cron",
+        help="minuto hora dia mês dia-da-semana, ex.: 0 9 * * mon-fri"
+    )
 
-# Botão de ativação
-if st.sidebar.button(
-    "✅ Ativar Envio Automático" if not st.session_state.get('auto_email_enabled', False) 
-    else "❌ Desativar Envio Automático"
-):
-    toggle_auto_email()
+    # O callback roda antes do fragmento, então a lista abaixo já sai atualizada
+    st.button(
+        "➕ Assinar",
+        disabled=not email_to or not codes,
+        on_click=subscribe_report,
+        args=(codes, quote_type)
+    )
+    if "auto_email_error" in st.session_state:
+        st.error(st.session_state.auto_email_error)
 
-# Status atual
-st.sidebar.markdown(f"""
-**Status:** {'🟢 Ativo (9:00 AM)' if st.session_state.get('auto_email_enabled', False) else '🔴 Inativo'}
-""")
+    # Assinaturas do destinatário, com o próximo envio de cada agendamento
+    subs = subscriptions.of(email_to) if email_to else {}
+    if not subs:
+        st.markdown("**Status:** 🔴 Nenhuma assinatura")
+    for sub_id, sub in subs.items():
+        job = scheduler.get(f"{SUBSCRIPTION_REPORT}:{sub['cron']}")
+        next_run = job["next_run"].strftime("%d/%m %H:%M") if job and job["next_run"] else "-"
+        label, remove = st.columns([5, 1])
+        period = f" · {sub['days']}d" if sub["report"] != "Média mensal" else ""
+        label.markdown(
+            f"🟢 {sub['report']} · {', '.join(sub['codes'])} · {sub['side']}{period} · "
+            f"`{sub['cron']}` (próximo {next_run})"
+        )
+        remove.button("🗑️", key=f"unsubscribe_{sub_id}", on_click=subscriptions.unsubscribe, args=(sub_id,))
+        last_run, error = (job or {}).get("last_run") or (None, None)
+        if error is not None:
+            st.warning(f"Último envio falhou: {error}")
+    st.caption(f"{subscriptions.count()} assinatura(s) no total")
 
-def calculate_monthly_average(df):
-    """
-    Calcula a média mensal das cotações para cada moeda
-    Retorna um DataFrame com as médias de compra e venda por moeda
-    """
-    if df.empty:
-        return pd.DataFrame()
-    
-    # Cria coluna com ano-mês para agrupamento
-    df['AnoMes'] = df['dataHoraCotacao'].dt.to_period('M')
-    
-    # Filtra apenas dados do mês atual
-    current_month = pd.Timestamp.now().to_period('M')
-    month_data = df[df['AnoMes'] == current_month]
-    
-    if month_data.empty:
-        return pd.DataFrame()
-    
-    # Calcula as médias
-    monthly_avg = month_data.groupby('Moeda').agg({
-        'cotacaoCompra': 'mean',
-        'cotacaoVenda': 'mean'
-    }).reset_index()
-    
-    monthly_avg = monthly_avg.rename(columns={
-        'cotacaoCompra': 'Média Compra (R$)',
-        'cotacaoVenda': 'Média Venda (R$)'
-    })
-    
-    # Formata os valores
-    monthly_avg['Média Compra (R$)'] = monthly_avg['Média Compra (R$)'].round(4)
-    monthly_avg['Média Venda (R$)'] = monthly_avg['Média Venda (R$)'].round(4)
-    
-    return monthly_avg
+with st.sidebar:
+    render_auto_email_settings()
 
-def send_monthly_report():
-    """Envia o relatório mensal automaticamente no último dia do mês"""
-    today = datetime.now()
-    last_day_of_month = (today.replace(day=28) + timedelta(days=4))
-    last_day_of_month = last_day_of_month - timedelta(days=last_day_of_month.day)
-    
-    # Verifica se é o último dia do mês
-    if today.day == last_day_of_month.day:
-        monthly_avg = calculate_monthly_average(df)
-        
-        if not monthly_avg.empty and st.session_state.get('email_recipients'):
-            # Formatação bonita para o e-mail
-            monthly_avg['Mês'] = today.strftime('%B/%Y')
-            html_content = monthly_avg.to_html(
-                index=False, 
-                border=0, 
-                justify='center',
-                float_format=lambda x: f'R$ {x:.4f}'
-            )
-            
-            # Corpo do e-mail formatado
-            email_body = f"""
-            <h2 style="color: #2c3e50;">📊 Relatório Mensal PTAX</h2>
-            <p>Confira as médias mensais das cotações:</p>
-            {html_content}
-            <p style="margin-top: 20px;">
-                <strong>Data do relatório:</strong> {today.strftime('%d/%m/%Y %H:%M')}
-            </p>
-            """
-            
-            # Envia para cada destinatário
-            for recipient in st.session_state.email_recipients:
-                try:
-                    send_email(
-                        monthly_avg,
-                        recipient,
-                        f"Relatório Mensal PTAX - {today.strftime('%m/%Y')}",
-                        email_body
-                    )
-                    st.success(f"Relatório mensal enviado para {recipient}")
-                except Exception as e:
-                    st.error(f"Erro ao enviar para {recipient}: {str(e)}")
+# Uso de memória dos caches do processo
+with st.sidebar.expander("🧠 Cache", expanded=False):
+    for cache in (data_cache, quote_cache.entries, figure_store.entries, export_cache.entries):
+        stats = cache.stats()
+        st.caption(
+            f"**{cache.name}**: {stats['entradas']} entradas, "
+            f"{stats['bytes'] / 1024 ** 2:.1f} / {stats['limite'] / 1024 ** 2:.0f} MB · "
+            f"acertos {stats['acertos']} · faltas {stats['faltas']} · descartes {stats['descartes']}"
+        )
+
+# Tempo da última execução completa e de cada fragmento (ms)
+with st.sidebar.expander("⏱️ Desempenho", expanded=False):
+    for name, ms in st.session_state.timings.items():
+        st.caption(f"**{name}**: {ms:.0f} ms")
 
 # — Load data —
-df, daily_stats = load_data(codes, start_date, end_date)
+# Versão lida antes da carga: um boletim que chegue no meio gera uma chave nova.
+# Ela entra na chave do load_data, dos gráficos e das exportações, então os três
+# sempre se referem aos mesmos dados
+data_version = quote_cache.version(codes)
+data_key = (data_version, tuple(codes), start_date, end_date)
+with st.spinner("Carregando dados do BCB..."):
+    df, daily_stats = load_data(codes, start_date, end_date, data_version)
 
 if df.empty:
     st.warning("⚠️ Nenhum dado disponível para o período selecionado.")
     st.stop()
 
-# Prepare data for display
-latest_df = df.sort_values("dataHoraCotacao").groupby("Moeda").last().reset_index()
-latest_df["Data/Hora"] = latest_df["dataHoraCotacao"].dt.strftime("%d/%m/%Y %H:%M")
-latest_df = latest_df.rename(columns={
-    "cotacaoCompra": "Compra (R$)", 
-    "cotacaoVenda": "Venda (R$)"
-})
-
-# Calculate metrics for display
-metrics_data = []
-for c in codes:
-    subset = df[df["Moeda"] == c]
-    if not subset.empty:
-        latest = subset.iloc[-1]
-        first = subset.iloc[0]
-        
-        compra_var = ((latest["cotacaoCompra"] - first["cotacaoCompra"]) / first["cotacaoCompra"]) * 100
-        venda_var = ((latest["cotacaoVenda"] - first["cotacaoVenda"]) / first["cotacaoVenda"]) * 100
-        
-        metrics_data.append({
-            "Moeda": c,
-            "Compra_Inicial": first["cotacaoCompra"],
-            "Compra_Final": latest["cotacaoCompra"],
-            "Compra_Var": compra_var,
-            "Venda_Inicial": first["cotacaoVenda"],
-            "Venda_Final": latest["cotacaoVenda"],
-            "Venda_Var": venda_var,
-            "Compra_Min": subset["cotacaoCompra"].min(),
-            "Compra_Max": subset["cotacaoCompra"].max(),
-            "Venda_Min": subset["cotacaoVenda"].min(),
-            "Venda_Max": subset["cotacaoVenda"].max(),
-            "Data_Inicial": first["dataHoraCotacao"],
-            "Data_Final": latest["dataHoraCotacao"]
-        })
-
-metrics_df = pd.DataFrame(metrics_data)
-
 # — Main UI —
 st.title("📊 Dashboard Avançado de Cotações PTAX")
 st.caption(f"Período: {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}")
 
-# Row 1: Key Metrics
-st.subheader("📌 Principais Indicadores")
-cols = st.columns(len(codes) + (1 if show_benchmark and "USD" not in codes else 0))
+# Defasagem dos dados: o cache serve o último dado bom enquanto atualiza em segundo plano
+refresh_times = []
+for c in codes:
+    refreshed_at, error = quote_cache.status(c)
+    if refreshed_at:
+        refresh_times.append(refreshed_at)
+    if error is not None:
+        since = f" (última atualização às {refreshed_at.strftime('%H:%M')})" if refreshed_at else ""
+        st.warning(f"⚠️ {c}: API do BCB indisponível, exibindo os últimos dados disponíveis{since}. Detalhe: {error}")
+if end_date >= today and refresh_times:
+    oldest = min(refresh_times)
+    age = int((datetime.now() - oldest).total_seconds() // 60)
+    st.caption(f"Cotações de hoje atualizadas às {oldest.strftime('%H:%M')} (há {age} min)")
 
-for i, c in enumerate(codes):
-    with cols[i]:
-        if c in metrics_df["Moeda"].values:
-            data = metrics_df[metrics_df["Moeda"] == c].iloc[0]
-            current_value = data[f"{quote_type}_Final"]
-            variation = data[f"{quote_type}_Var"]
-            
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>{c} - {quote_type}</h3>
-                <div class="value">R$ {current_value:.4f}</div>
-                <div class="delta {'up' if variation >= 0 else 'down'}">
-                    {'+' if variation >= 0 else ''}{variation:.2f}% 
-                    <small>no período</small>
-                </div>
-                <div style="font-size: 0.8rem; margin-top: 8px; color: #666;">
-                    Mín: R$ {data[f"{quote_type}_Min"]:.4f}<br>
-                    Máx: R$ {data[f"{quote_type}_Max"]:.4f}
+# — Atualização ao vivo: o poller injeta boletins novos no cache e só os
+# fragmentos abaixo (cards e gráfico intradiário) são reexecutados —
+# Só períodos que incluem hoje recebem boletins novos; os demais não acionam o poller
+live_every = POLL_SECONDS if end_date >= today else None
+if live_every:
+    poller.watch(codes + (["USD"] if show_benchmark and "USD" not in codes else []))
+
+def load_live(live_codes):
+    """Cotações atuais das moedas (fatias do cache, sem reagrupamento)"""
+    frames = []
+    for c in live_codes:
+        c_df = get_currency_data(c, start_date, end_date)
+        if not c_df.empty:
+            frames.append(c_df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def live_metrics(live_codes):
+    """Indicadores recalculados apenas quando a versão dos dados muda"""
+    key = f"live_metrics:{','.join(live_codes)}:{start_date}:{end_date}"
+    version = quote_cache.version(live_codes)
+    cached_entry = st.session_state.get(key)
+    if cached_entry is None or cached_entry[0] != version:
+        cached_entry = (version, compute_metrics(load_live(live_codes)))
+        st.session_state[key] = cached_entry
+    return cached_entry[1]
+
+@st.fragment(run_every=live_every)
+def render_metric_cards():
+    # Row 1: Key Metrics
+    st.subheader("📌 Principais Indicadores")
+    cols = st.columns(len(codes) + (1 if show_benchmark and "USD" not in codes else 0))
+    metrics_by_code = live_metrics(codes).set_index("Moeda")
+
+    for i, c in enumerate(codes):
+        with cols[i]:
+            if c in metrics_by_code.index:
+                data = metrics_by_code.loc[c]
+                current_value = data[f"{quote_type}_Final"]
+                variation = data[f"{quote_type}_Var"]
+                
+                st.markdown(f"""
+                <div class="metric-card">
+                    <h3>{c} - {quote_type}</h3>
+                    <div class="value">R$ {current_value:.4f}</div>
+                    <div class="delta {'up' if variation >= 0 else 'down'}">
+                        {'+' if variation >= 0 else ''}{variation:.2f}% 
+                        <small>no período</small>
+                    </div>
+                    <div style="font-size: 0.8rem; margin-top: 8px; color: #666;">
+                        Mín: R$ {data[f"{quote_type}_Min"]:.4f}<br>
+                        Máx: R$ {data[f"{quote_type}_Max"]:.4f}
+                    </div>
                 </div>
-            </div>
-            """, unsafe_allow_html=True)
-
-# Add USD benchmark if requested
-if show_benchmark and "USD" not in codes:
-    with cols[-1]:
-        usd_data = get_currency_data("USD", start_date, end_date)
-        if not usd_data.empty:
-            usd_latest = usd_data.iloc[-1]
-            usd_first = usd_data.iloc[0]
-            usd_var = ((usd_latest["cotacaoCompra"] - usd_first["cotacaoCompra"]) / usd_first["cotacaoCompra"]) * 100
-            
-            st.markdown(f"""
-            <div class="metric-card" style="border-left-color: #ff9800;">
-                <h3>USD - Benchmark</h3>
-                <div class="value">R$ {usd_latest['cotacaoCompra']:.4f}</div>
-                <div class="delta {'up' if usd_var >= 0 else 'down'}">
-                    {'+' if usd_var >= 0 else ''}{usd_var:.2f}% 
-                    <small>no período</small>
+                """, unsafe_allow_html=True)
+
+    # Add USD benchmark if requested
+    if show_benchmark and "USD" not in codes:
+        with cols[-1]:
+            usd_metrics = live_metrics(["USD"])
+            if not usd_metrics.empty:
+                usd_metrics = usd_metrics.iloc[0]
+                usd_var = usd_metrics["Compra_Var"]
+                
+                st.markdown(f"""
+                <div class="metric-card" style="border-left-color: #ff9800;">
+                    <h3>USD - Benchmark</h3>
+                    <div class="value">R$ {usd_metrics['Compra_Final']:.4f}</div>
+                    <div class="delta {'up' if usd_var >= 0 else 'down'}">
+                        {'+' if usd_var >= 0 else ''}{usd_var:.2f}% 
+                        <small>no período</small>
+                    </div>
                 </div>
-            </div>
-            """, unsafe_allow_html=True)
+                """, unsafe_allow_html=True)
 
-# Tabs for different views
-tab1, tab2, tab3, tab4 = st.tabs(["📈 Análise Temporal", "🔄 Comparativo", "📋 Dados Detalhados", "📤 Exportar"])
+    if live_every and poller.last_poll:
+        st.caption(f"🔄 Boletins verificados às {poller.last_poll.strftime('%H:%M:%S')}")
 
-with tab1:
+@st.fragment(run_every=live_every)
+def render_intraday_chart():
+    # Intraday analysis
+    live_df = load_live(codes)
+    if live_df.empty:
+        st.info("Dados intradiários não disponíveis para o período selecionado.")
+        return
+    
+    # Zoom no servidor: a janela escolhida é recortada e reduzida antes de ir ao navegador
+    t_min = live_df["dataHoraCotacao"].min().to_pydatetime()
+    t_max = live_df["dataHoraCotacao"].max().to_pydatetime()
+    zoom_cols = st.columns([3, 1])
+    if t_min < t_max:
+        t_from, t_to = zoom_cols[0].slider(
+            "Janela do gráfico", min_value=t_min, max_value=t_max, value=(t_min, t_max),
+            format="DD/MM/YY HH:mm", key="intraday_zoom"
+        )
+        live_df = live_df[live_df["dataHoraCotacao"].between(t_from, t_to)]
+    method = zoom_cols[1].radio("Redução de pontos", list(DOWNSAMPLE_METHODS), index=0, key="intraday_method")
+    
+    y_col = f"cotacao{quote_type}"
+    use_webgl = len(live_df) > WEBGL_THRESHOLD
+    Trace = go.Scattergl if use_webgl else go.Scatter
+    fig = go.Figure()
+    shown = 0
+    for c in codes:
+        c_data = live_df[live_df["Moeda"] == c].sort_values("dataHoraCotacao")
+        if c_data.empty:
+            continue
+        reduced = decimate(c_data, "dataHoraCotacao", y_col, CHART_WIDTH_PX, method)
+        shown += len(reduced)
+        fig.add_trace(Trace(
+            x=reduced["dataHoraCotacao"],
+            y=reduced[y_col],
+            name=c,
+            mode="lines" if use_webgl else "lines+markers",
+            marker=dict(size=5),
+            line=dict(width=2)
+        ))
+    
+    fig.update_layout(
+        height=500,
+        template="plotly_white",
+        hovermode="x unified",
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(
+            title="Data/Hora",
+            rangeslider=dict(visible=not use_webgl),
+            type="date"
+        ),
+        yaxis_title=f"Valor {quote_type} (R$)"
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    if shown < len(live_df):
+        st.caption(f"Exibindo {shown} de {len(live_df)} pontos ({method}{', WebGL' if use_webgl else ''}).")
+
+render_metric_cards()
+
+def figure_key(kind, *extra):
+    """Chave do figure_store: muda quando chegam boletins novos (versão dos dados)"""
+    return (kind,) + data_key + (quote_type, analysis_level) + extra
+
+# Views: cada uma é um fragmento e só a selecionada é calculada
+@st.fragment
+@timed("📈 Análise Temporal")
+def render_temporal():
     st.subheader(f"Análise Temporal - {quote_type}")
     
-    if analysis_level == "Diário" and not daily_stats.empty:
+    if analysis_level in ROLLUP_LEVELS:
+        # Rollup analysis (lê as agregações já materializadas)
+        rollup_df = rollups.get(codes, analysis_level, start_date, end_date)
+        if rollup_df.empty:
+            st.info("Dados agregados não disponíveis para o período selecionado.")
+        else:
+            def build():
+                fig = go.Figure()
+                for c in codes:
+                    c_data = rollup_df[rollup_df["Moeda"] == c]
+                    fig.add_trace(go.Scatter(
+                        x=c_data["Periodo"],
+                        y=c_data[f"{quote_type}_Media"],
+                        name=f"{c} - Média",
+                        mode="lines+markers",
+                        line=dict(width=2),
+                        marker=dict(size=6)
+                    ))
+                    fig.add_trace(go.Scatter(
+                        x=pd.concat([c_data["Periodo"], c_data["Periodo"][::-1]]),
+                        y=pd.concat([c_data[f"{quote_type}_Max"], c_data[f"{quote_type}_Min"][::-1]]),
+                        fill="toself",
+                        fillcolor="rgba(0,100,80,0.2)",
+                        line=dict(color="rgba(255,255,255,0)"),
+                        hoverinfo="skip",
+                        name=f"{c} - Variação",
+                        showlegend=False
+                    ))
+                fig.update_layout(
+                    height=500,
+                    template="plotly_white",
+                    hovermode="x unified",
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                    margin=dict(l=20, r=20, t=40, b=20),
+                    xaxis_title="Período",
+                    yaxis_title=f"Valor de {quote_type} (R$)"
+                )
+                return fig
+            st.plotly_chart(figure_store.get(figure_key("Rollup"), build), use_container_width=True)
+    elif analysis_level == "Diário" and not daily_stats.empty:
         # Daily analysis
-        fig = make_subplots(specs=[[{"secondary_y": True}]])
+        def build():
+            fig = make_subplots(specs=[[{"secondary_y": True}]])
         
-        for c in codes:
-            c_data = daily_stats[daily_stats["Moeda"] == c]
-            fig.add_trace(
-                go.Scatter(
-                    x=c_data["Dia"],
-                    y=c_data[f"{quote_type}_Media"],
-                    name=f"{c} - Média",
-                    mode="lines+markers",
-                    line=dict(width=2),
-                    marker=dict(size=8)
-                ),
-                secondary_y=False
-            )
+            for c in codes:
+                c_data = daily_stats[daily_stats["Moeda"] == c]
+                fig.add_trace(
+                    go.Scatter(
+                        x=c_data["Dia"],
+                        y=c_data[f"{quote_type}_Media"],
+                        name=f"{c} - Média",
+                        mode="lines+markers",
+                        line=dict(width=2),
+                        marker=dict(size=8)
+                    ),
+                    secondary_y=False
+                )
             
-            # Add range (min-max)
-            fig.add_trace(
-                go.Scatter(
-                    x=pd.concat([c_data["Dia"], c_data["Dia"][::-1]]),
-                    y=pd.concat([c_data[f"{quote_type}_Max"], c_data[f"{quote_type}_Min"][::-1]]),
-                    fill="toself",
-                    fillcolor="rgba(0,100,80,0.2)",
-                    line=dict(color="rgba(255,255,255,0)"),
-                    hoverinfo="skip",
-                    name=f"{c} - Variação",
-                    showlegend=False
-                ),
-                secondary_y=False
-            )
-        
-        fig.update_layout(
-            height=500,
-            template="plotly_white",
-            hovermode="x unified",
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            margin=dict(l=20, r=20, t=40, b=20),
-            xaxis_title="Data",
-            yaxis_title=f"Valor de {quote_type} (R$)"
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        # Intraday analysis
-        fig = px.line(
-            df, 
-            x="dataHoraCotacao", 
-            y=f"cotacao{quote_type}", 
-            color="Moeda",
-            labels={"dataHoraCotacao": "Data/Hora", f"cotacao{quote_type}": f"Valor {quote_type} (R$)"},
-            template="plotly_white"
-        )
-        
-        fig.update_traces(
-            mode="lines+markers",
-            marker=dict(size=5),
-            line=dict(width=2)
-        )
+                # Add range (min-max)
+                fig.add_trace(
+                    go.Scatter(
+                        x=pd.concat([c_data["Dia"], c_data["Dia"][::-1]]),
+                        y=pd.concat([c_data[f"{quote_type}_Max"], c_data[f"{quote_type}_Min"][::-1]]),
+                        fill="toself",
+                        fillcolor="rgba(0,100,80,0.2)",
+                        line=dict(color="rgba(255,255,255,0)"),
+                        hoverinfo="skip",
+                        name=f"{c} - Variação",
+                        showlegend=False
+                    ),
+                    secondary_y=False
+                )
         
-        fig.update_layout(
-            height=500,
-            hovermode="x unified",
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            margin=dict(l=20, r=20, t=40, b=20),
-            xaxis=dict(
-                rangeslider=dict(visible=True),
-                type="date"
+            fig.update_layout(
+                height=500,
+                template="plotly_white",
+                hovermode="x unified",
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                margin=dict(l=20, r=20, t=40, b=20),
+                xaxis_title="Data",
+                yaxis_title=f"Valor de {quote_type} (R$)"
             )
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+            return fig
+        st.plotly_chart(figure_store.get(figure_key("Diário"), build), use_container_width=True)
+    else:
+        render_intraday_chart()
     
     # Add statistics section
     st.subheader("📊 Estatísticas Descritivas")
@@ -622,51 +605,123 @@ with tab1:
     with stats_cols[0]:
         st.markdown("**Variação Diária**")
         if not daily_stats.empty:
-            fig = px.bar(
-                daily_stats,
-                x="Dia",
-                y=f"{quote_type}_Var_Dia",
-                color="Moeda",
-                barmode="group",
-                labels={f"{quote_type}_Var_Dia": "Variação (%)", "Dia": "Data"},
-                template="plotly_white"
-            )
-            fig.update_layout(height=300)
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                fig = px.bar(
+                    daily_stats,
+                    x="Dia",
+                    y=f"{quote_type}_Var_Dia",
+                    color="Moeda",
+                    barmode="group",
+                    labels={f"{quote_type}_Var_Dia": "Variação (%)", "Dia": "Data"},
+                    template="plotly_white"
+                )
+                fig.update_layout(height=300)
+                return fig
+            st.plotly_chart(figure_store.get(figure_key("Variação Diária"), build), use_container_width=True)
         else:
             st.info("Dados diários não disponíveis para o período selecionado.")
     
     with stats_cols[1]:
         st.markdown("**Volatilidade (Máxima e Mínima)**")
         if not daily_stats.empty:
-            fig = go.Figure()
+            def build():
+                fig = go.Figure()
             
-            for c in codes:
-                c_data = daily_stats[daily_stats["Moeda"] == c]
-                fig.add_trace(go.Bar(
-                    x=c_data["Dia"],
-                    y=c_data[f"{quote_type}_Var_Max"],
-                    name=f"{c} - Máxima",
-                    marker_color="green"
-                ))
-                fig.add_trace(go.Bar(
-                    x=c_data["Dia"],
-                    y=c_data[f"{quote_type}_Var_Min"],
-                    name=f"{c} - Mínima",
-                    marker_color="red"
-                ))
+                for c in codes:
+                    c_data = daily_stats[daily_stats["Moeda"] == c]
+                    fig.add_trace(go.Bar(
+                        x=c_data["Dia"],
+                        y=c_data[f"{quote_type}_Var_Max"],
+                        name=f"{c} - Máxima",
+                        marker_color="green"
+                    ))
+                    fig.add_trace(go.Bar(
+                        x=c_data["Dia"],
+                        y=c_data[f"{quote_type}_Var_Min"],
+                        name=f"{c} - Mínima",
+                        marker_color="red"
+                    ))
             
-            fig.update_layout(
-                barmode="group",
-                height=300,
-                template="plotly_white",
-                yaxis_title="Variação (%)"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+                fig.update_layout(
+                    barmode="group",
+                    height=300,
+                    template="plotly_white",
+                    yaxis_title="Variação (%)"
+                )
+                return fig
+            st.plotly_chart(figure_store.get(figure_key("Volatilidade"), build), use_container_width=True)
         else:
             st.info("Dados diários não disponíveis para o período selecionado.")
+    
+    # Technical indicators (estado incremental por moeda/indicador/janela)
+    st.subheader("📐 Indicadores Técnicos")
+    
+    ind_cols = st.columns([2, 1])
+    selected_indicators = ind_cols[0].multiselect(
+        "Indicadores",
+        list(INDICATORS),
+        ["SMA", "EWMA"],
+        help="SMA/EWMA: médias móveis. Volatilidade: desvio dos log-retornos anualizado. "
+             "Drawdown: queda em relação ao pico do período."
+    )
+    indicator_window = ind_cols[1].slider("Janela dos indicadores", 3, 60, 10)
+    
+    # Base: fechamento diário ou cada boletim no modo intradiário
+    indicator_level = "Intradiário" if analysis_level == "Intradiário" else "Diário"
+    base_series = {}
+    for c in codes:
+        if indicator_level == "Diário" and not daily_stats.empty:
+            c_data = daily_stats[daily_stats["Moeda"] == c]
+            base_series[c] = c_data.set_index("Dia")[f"{quote_type}_Final"]
+        elif indicator_level == "Intradiário":
+            c_data = df[df["Moeda"] == c].sort_values("dataHoraCotacao")
+            base_series[c] = c_data.set_index("dataHoraCotacao")[f"cotacao{quote_type}"]
+    
+    def indicator(c, name):
+        return indicator_engine.compute(
+            (c, indicator_level, quote_type), base_series[c], name, indicator_window,
+            PERIODS_PER_YEAR[indicator_level]
+        )
+    
+    overlays = [i for i in selected_indicators if i in ("SMA", "EWMA")]
+    if base_series and overlays:
+        fig = go.Figure()
+        for c, series in base_series.items():
+            fig.add_trace(go.Scatter(x=series.index, y=series, name=c, mode="lines", line=dict(width=1)))
+            for name in overlays:
+                fig.add_trace(go.Scatter(
+                    x=series.index, y=indicator(c, name),
+                    name=f"{c} - {name} {indicator_window}", mode="lines", line=dict(width=2, dash="dot")
+                ))
+        fig.update_layout(height=400, template="plotly_white", hovermode="x unified",
+                          yaxis_title=f"Valor de {quote_type} (R$)")
+        st.plotly_chart(fig, use_container_width=True)
+    
+    risk_cols = st.columns(2)
+    if base_series and "Volatilidade" in selected_indicators:
+        with risk_cols[0]:
+            st.markdown(f"**Volatilidade Realizada ({indicator_window} períodos, % a.a.)**")
+            fig = go.Figure()
+            for c, series in base_series.items():
+                fig.add_trace(go.Scatter(x=series.index, y=indicator(c, "Volatilidade"), name=c, mode="lines"))
+            fig.update_layout(height=300, template="plotly_white", yaxis_title="Volatilidade (%)")
+            st.plotly_chart(fig, use_container_width=True)
+    if base_series and "Drawdown" in selected_indicators:
+        with risk_cols[1]:
+            st.markdown("**Drawdown**")
+            fig = go.Figure()
+            max_dd = []
+            for c, series in base_series.items():
+                dd = indicator(c, "Drawdown")
+                max_dd.append(f"{c}: {dd.min():.2f}%")
+                fig.add_trace(go.Scatter(x=series.index, y=dd, name=c, mode="lines", fill="tozeroy"))
+            fig.update_layout(height=300, template="plotly_white", yaxis_title="Drawdown (%)")
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption("Drawdown máximo — " + " · ".join(max_dd))
 
-with tab2:
+@st.fragment
+@timed("🔄 Comparativo")
+def render_comparative():
     st.subheader("Análise Comparativa entre Moedas")
     
     if len(codes) > 1:
@@ -686,77 +741,161 @@ with tab2:
             
             if comparison_data:
                 comparison_df = pd.concat(comparison_data)
-                fig = px.line(
-                    comparison_df,
-                    x="dataHoraCotacao",
-                    y="Normalized",
-                    color="Moeda",
-                    labels={"dataHoraCotacao": "Data/Hora", "Normalized": "Valor Normalizado (Base 100)"},
-                    template="plotly_white"
-                )
-                fig.update_layout(height=400)
-                st.plotly_chart(fig, use_container_width=True)
+                def build():
+                    fig = px.line(
+                        comparison_df,
+                        x="dataHoraCotacao",
+                        y="Normalized",
+                        color="Moeda",
+                        labels={"dataHoraCotacao": "Data/Hora", "Normalized": "Valor Normalizado (Base 100)"},
+                        template="plotly_white"
+                    )
+                    fig.update_layout(height=400)
+                    return fig
+                st.plotly_chart(figure_store.get(figure_key("Base 100"), build), use_container_width=True)
         
         with comp_cols[1]:
             st.markdown("**Correlação entre Moedas**")
             
-            # Create pivot table for correlation
-            pivot_df = df.pivot(index="dataHoraCotacao", columns="Moeda", values=f"cotacao{quote_type}")
-            corr_matrix = pivot_df.corr()
+            corr_opts = st.columns(2)
+            grid = corr_opts[0].radio("Grade", list(PANEL_GRIDS), index=0, horizontal=True,
+                                      help="Dia: fechamento diário. Boletim: última cotação de cada hora.")
+            window = corr_opts[1].slider("Janela móvel (períodos)", 5, 120, 30)
             
-            fig = go.Figure(data=go.Heatmap(  # ← Parênteses abertos corretamente
-                z=corr_matrix.values,
-                x=corr_matrix.columns,
-                y=corr_matrix.index,
-                colorscale="Viridis",
-                zmin=-1,
-                zmax=1,
-                colorbar=dict(title="Correlação")
-            ))  # ← Parênteses fechados corretamente
-             
-            fig.update_layout(
-                height=400,
-                xaxis_title="Moeda",
-                yaxis_title="Moeda"
+            # Painel alinhado + correlação móvel (em cache por janela)
+            columns, corr_dates, cov, corr = rolling_correlation(
+                codes, start_date, end_date, data_version, quote_type, grid, window
             )
             
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Display correlation values
-            st.markdown("**Valores de Correlação**")
-            st.dataframe(corr_matrix.style.background_gradient(cmap="viridis", vmin=-1, vmax=1))
+            if len(corr_dates) == 0:
+                st.info("Período curto demais para a janela escolhida. Reduza a janela ou amplie o período.")
+            else:
+                corr_matrix = pd.DataFrame(corr[-1], index=columns, columns=columns)
+                st.caption(f"Correlação dos retornos nos últimos {window} períodos até "
+                           f"{corr_dates[-1].strftime('%d/%m/%Y %H:%M')}")
+                
+                def build():
+                    fig = go.Figure(data=go.Heatmap(
+                        z=corr_matrix.values,
+                        x=corr_matrix.columns,
+                        y=corr_matrix.index,
+                        colorscale="Viridis",
+                        zmin=-1,
+                        zmax=1,
+                        colorbar=dict(title="Correlação")
+                    ))
+                 
+                    fig.update_layout(
+                        height=400,
+                        xaxis_title="Moeda",
+                        yaxis_title="Moeda"
+                    )
+                    return fig
+                st.plotly_chart(figure_store.get(figure_key("Correlação", grid, window), build), use_container_width=True)
+                
+                st.markdown("**Correlação Móvel por Par**")
+                pairs = pair_series(corr_dates, corr, columns)
+                def build():
+                    fig = px.line(
+                        pairs,
+                        labels={"value": "Correlação", "index": "Data", "variable": "Par"},
+                        template="plotly_white"
+                    )
+                    fig.update_layout(height=300, yaxis_range=[-1, 1])
+                    return fig
+                st.plotly_chart(figure_store.get(figure_key("Correlação por Par", grid, window), build), use_container_width=True)
+                
+                # Display correlation values
+                st.markdown("**Valores de Correlação**")
+                st.dataframe(corr_matrix.style.background_gradient(cmap="viridis", vmin=-1, vmax=1))
     
     else:
         st.info("Selecione pelo menos duas moedas para análise comparativa.")
+    
+    st.subheader("💱 Taxas Cruzadas")
+    cross_grid = st.radio("Grade das taxas cruzadas", list(PANEL_GRIDS), index=0, horizontal=True,
+                          key="cross_grid")
+    cross = cross_rates(codes, start_date, end_date, data_version, cross_grid)
+    if len(cross.index) == 0:
+        st.info("Dados insuficientes para calcular taxas cruzadas no período selecionado.")
+    else:
+        cross_cols = st.columns([3, 2])
+        with cross_cols[0]:
+            st.markdown(f"**Matriz de {quote_type} em {cross.index[-1].strftime('%d/%m/%Y %H:%M')}** "
+                        "(unidades da coluna por 1 unidade da linha)")
+            st.dataframe(cross.matrix(quote_type).style.format("{:.4f}"), use_container_width=True)
+        with cross_cols[1]:
+            pair_cols = st.columns(2)
+            base = pair_cols[0].selectbox("Base", cross.currencies, index=min(2, len(cross.currencies) - 1))
+            quote = pair_cols[1].selectbox("Cotada", cross.currencies, index=1 if len(cross.currencies) > 1 else 0)
+            pair = cross.pair(base, quote, quote_type)
+            fig = px.line(pair, labels={"value": f"{base}/{quote}", "variable": "Par"}, template="plotly_white")
+            fig.update_layout(height=300, showlegend=False, xaxis_title="Data", yaxis_title=f"{base}/{quote} ({quote_type})")
+            st.plotly_chart(fig, use_container_width=True)
+
+# Formatos nativos (os valores continuam numéricos; a formatação é feita no navegador)
+PRICE_FORMAT = st.column_config.NumberColumn(format="R$ %.4f")
+PERCENT_FORMAT = st.column_config.NumberColumn(format="%.2f%%")
 
-with tab3:
+def table_column_config(table):
+    config = {}
+    for col in table.columns:
+        if col in ("cotacaoCompra", "cotacaoVenda") or col.endswith(("_Inicial", "_Final", "_Min", "_Max", "_Media")):
+            config[col] = PRICE_FORMAT
+        elif "_Var" in col:
+            config[col] = PERCENT_FORMAT
+    config["Periodo"] = st.column_config.DatetimeColumn("Período", format="DD/MM/YYYY")
+    config["Dia"] = st.column_config.DatetimeColumn(format="DD/MM/YYYY")
+    config["dataHoraCotacao"] = st.column_config.DatetimeColumn("Data/Hora", format="DD/MM/YYYY HH:mm")
+    config["cotacaoCompra"] = st.column_config.NumberColumn("Compra (R$)", format="R$ %.4f")
+    config["cotacaoVenda"] = st.column_config.NumberColumn("Venda (R$)", format="R$ %.4f")
+    config["tipoBoletim"] = st.column_config.TextColumn("Boletim")
+    return config
+
+@st.fragment
+@timed("📋 Dados Detalhados")
+def render_details():
     st.subheader("Dados Detalhados")
     
-    if analysis_level == "Diário" and not daily_stats.empty:
-        display_df = daily_stats.copy()
-        display_df["Dia"] = display_df["Dia"].apply(lambda x: x.strftime("%d/%m/%Y"))
-        
-        # Format columns
-        for col in ["Compra_Inicial", "Compra_Final", "Compra_Min", "Compra_Max", "Compra_Media",
-                   "Venda_Inicial", "Venda_Final", "Venda_Min", "Venda_Max", "Venda_Media"]:
-            display_df[col] = display_df[col].apply(lambda x: f"R$ {x:.4f}")
-        
-        for col in ["Compra_Var_Dia", "Compra_Var_Max", "Compra_Var_Min",
-                   "Venda_Var_Dia", "Venda_Var_Max", "Venda_Var_Min"]:
-            display_df[col] = display_df[col].apply(lambda x: f"{x:.2f}%")
-        
-        st.dataframe(display_df, use_container_width=True)
+    if analysis_level in ROLLUP_LEVELS:
+        table = rollups.get(codes, analysis_level, start_date, end_date)
+    elif analysis_level == "Diário" and not daily_stats.empty:
+        table = daily_stats
     else:
-        display_df = df.copy()
-        display_df["dataHoraCotacao"] = display_df["dataHoraCotacao"].dt.strftime("%d/%m/%Y %H:%M")
-        display_df = display_df.rename(columns={
-            "dataHoraCotacao": "Data/Hora",
-            "cotacaoCompra": "Compra (R$)",
-            "cotacaoVenda": "Venda (R$)"
-        })
-        st.dataframe(display_df[["Moeda", "Data/Hora", "Compra (R$)", "Venda (R$)"]], use_container_width=True)
-
-with tab4:
+        # CotacaoDolarPeriodo não traz tipoBoletim: a coluna só entra se existir
+        columns = ["Moeda", "dataHoraCotacao", "tipoBoletim", "cotacaoCompra", "cotacaoVenda"]
+        table = df[[c for c in columns if c in df.columns]]
+    
+    if table.empty:
+        st.info("Dados não disponíveis para o período selecionado.")
+        return
+    
+    # Filtro, ordenação e paginação no servidor: só a página visível vai ao navegador
+    ctrl = st.columns([2, 2, 2, 1, 1])
+    filters = {"Moeda": ctrl[0].multiselect("Filtrar moedas", codes, key="table_codes")}
+    if "tipoBoletim" in table.columns:
+        filters["tipoBoletim"] = ctrl[1].multiselect(
+            "Filtrar boletins", list(table["tipoBoletim"].cat.categories), key="table_bulletins"
+        )
+    sort_by = ctrl[2].selectbox("Ordenar por", list(table.columns), index=1, key="table_sort")
+    ascending = ctrl[3].radio("Ordem", ["↑", "↓"], horizontal=True, key="table_order") == "↑"
+    page_size = ctrl[4].selectbox("Linhas", PAGE_SIZES, key="table_page_size")
+    
+    filtered = filter_rows(table, filters)
+    pages = page_count(len(filtered), page_size)
+    # Sem key: mudar o total de páginas recria o controle na página 1
+    page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, value=1)
+    page_df, pages = page_rows(filtered, sort_by, ascending, page, page_size)
+    
+    st.dataframe(page_df, column_config=table_column_config(page_df), hide_index=True,
+                 use_container_width=True)
+    first = (page - 1) * page_size
+    st.caption(f"Linhas {first + 1 if len(filtered) else 0}–{first + len(page_df)} de {len(filtered)}"
+               f" · página {page} de {pages}")
+
+@st.fragment
+@timed("📤 Exportar")
+def render_export():
     st.subheader("Exportar Dados e Análise")
     
     export_cols = st.columns(2)
@@ -766,59 +905,84 @@ with tab4:
         
         export_format = st.radio(
             "Formato de exportação",
-            ["CSV", "Excel"],
+            list(EXPORT_FORMATS),
             index=0,
             horizontal=True
         )
+        extra_tables = st.multiselect(
+            "Incluir também",
+            ["Estatísticas diárias"] + [f"Agregado {lvl}" for lvl in ROLLUP_LEVELS],
+            help="No Excel cada tabela vira uma aba; em CSV/Parquet, um arquivo dentro de um ZIP."
+        )
         
-        if st.button("⬇️ Baixar Dados Completos"):
-            if export_format == "CSV":
-                csv = df.to_csv(index=False).encode("utf-8")
-                st.download_button(
-                    label="Clique para baixar",
-                    data=csv,
-                    file_name=f"ptax_data_{start_date}_{end_date}.csv",
-                    mime="text/csv"
-                )
-            else:
-                excel = df.to_excel(index=False)
-                st.download_button(
-                    label="Clique para baixar",
-                    data=excel,
-                    file_name=f"ptax_data_{start_date}_{end_date}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+        def export_tables():
+            tables = {"Cotações": df}
+            if "Estatísticas diárias" in extra_tables:
+                tables["Estatísticas diárias"] = daily_stats
+            for lvl in ROLLUP_LEVELS:
+                if f"Agregado {lvl}" in extra_tables:
+                    tables[f"Agregado {lvl}"] = rollups.get(codes, lvl, start_date, end_date)
+            return tables
+        
+        # Gerado em pedaços e guardado por (versão dos dados, período, formato, tabelas);
+        # df e daily_stats vêm do load_data da mesma versão, então o arquivo nunca é antigo
+        with st.spinner("Gerando arquivo..."):
+            export_data, ext, mime = export_cache.get(
+                data_key + (tuple(extra_tables),),
+                export_tables, export_format
+            )
+        st.download_button(
+            label="⬇️ Baixar Dados Completos",
+            data=export_data,
+            file_name=f"ptax_data_{start_date}_{end_date}.{ext}",
+            mime=mime,
+            on_click="ignore"
+        )
     
     with export_cols[1]:
         st.markdown("**Enviar por E-mail**")
         
-        email_to = st.text_input("Destinatário", "")
-        email_subject = st.text_input("Assunto", f"Análise PTAX {start_date} a {end_date}")
-        
-        analysis_text = st.text_area(
-            "Adicionar análise personalizada",
-            "Segue análise das cotações PTAX para o período selecionado. "
-            "Destacam-se as seguintes observações:\n\n"
-            "- Variação média no período\n"
-            "- Comportamento comparativo entre moedas\n"
-            "- Principais pontos de máxima e mínima"
-        )
+        # Formulário: digitar não reexecuta nada até o envio
+        with st.form("email_form", border=False):
+            email_to = st.text_input("Destinatário", "")
+            email_subject = st.text_input("Assunto", f"Análise PTAX {start_date} a {end_date}")
+            
+            analysis_text = st.text_area(
+                "Adicionar análise personalizada",
+                "Segue análise das cotações PTAX para o período selecionado. "
+                "Destacam-se as seguintes observações:\n\n"
+                "- Variação média no período\n"
+                "- Comportamento comparativo entre moedas\n"
+                "- Principais pontos de máxima e mínima"
+            )
+            
+            submitted = st.form_submit_button("📤 Enviar Relatório Completo")
         
-        if st.button("📤 Enviar Relatório Completo"):
+        if submitted:
             if not email_to:
                 st.warning("Por favor, informe um destinatário")
             else:
-                with st.spinner("Enviando e-mail..."):
-                    # Prepare data for email
-                    email_df = latest_df[["Moeda", "Data/Hora", "Compra (R$)", "Venda (R$)"]].copy()
-                    email_df["Variação (%)"] = email_df.apply(
-                        lambda row: ((row["Compra (R$)"] - metrics_df[metrics_df["Moeda"] == row["Moeda"]]["Compra_Inicial"].values[0]) / 
-                                   metrics_df[metrics_df["Moeda"] == row["Moeda"]]["Compra_Inicial"].values[0]) * 100,
-                        axis=1
-                    )
-                    
-                    success = send_email(email_df, email_to, email_subject, analysis_text)
-                    if success:
-                        st.success("E-mail enviado com sucesso!")
-                    else:
-                        st.error("Falha ao enviar o e-mail")
\ No newline at end of file
+                # Prepare data for email (mesmos indicadores dos cards, por versão dos dados)
+                email_df = email_table(live_metrics(codes))
+                
+                job = send_email(email_df, email_to, email_subject, analysis_text)
+                if job is None:
+                    st.error("Falha ao enviar o e-mail: não há dados no período")
+                else:
+                    st.session_state.mail_job = job
+        
+        # Acompanhamento do último envio desta sessão (a fila roda em segundo plano)
+        if "mail_job" in st.session_state:
+            st.caption(st.session_state.mail_job.status())
+
+VIEWS = {
+    "📈 Análise Temporal": render_temporal,
+    "🔄 Comparativo": render_comparative,
+    "📋 Dados Detalhados": render_details,
+    "📤 Exportar": render_export,
+}
+view = st.radio("Visualização", list(VIEWS), horizontal=True, key="view",
+                label_visibility="collapsed")
+VIEWS[view]()
+
+st.session_state.timings["Execução completa"] = (time.perf_counter() - run_started) * 1000
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from panel import aligned_panel
+
+# — Taxas cruzadas entre moedas a partir das cotações PTAX em BRL —
+
+
+class CrossRates:
+    """
+    Taxas cruzadas A/B (quantas unidades de B por 1 A) derivadas das
+    cotações em BRL de um painel alinhado. Segue a convenção de mesa:
+    compra A/B = compra A / venda B e venda A/B = venda A / compra B.
+    BRL entra como moeda de valor 1. Os pares são calculados sob demanda
+    e guardados; a matriz N×N completa é obtida por broadcasting.
+    """
+
+    def __init__(self, compra, venda):
+        compra, venda = compra.align(venda, join="inner")
+        compra.insert(0, "BRL", 1.0)
+        venda.insert(0, "BRL", 1.0)
+        self.index = compra.index
+        self.currencies = list(compra.columns)
+        self._compra = compra.to_numpy(dtype=np.float64)
+        self._venda = venda.to_numpy(dtype=np.float64)
+        self._pairs = {}
+
+    @classmethod
+    def from_quotes(cls, df, daily_stats, grid="Dia"):
+        return cls(aligned_panel(df, daily_stats, "Compra", grid),
+                   aligned_panel(df, daily_stats, "Venda", grid))
+
+    def _sides(self, side):
+        # Numerador usa o próprio lado; denominador, o lado oposto
+        if side == "Compra":
+            return self._compra, self._venda
+        return self._venda, self._compra
+
+    def pair(self, base, quote, side="Compra"):
+        """Série temporal da taxa base/quote (materializada uma única vez)"""
+        key = (base, quote, side)
+        if key not in self._pairs:
+            num, den = self._sides(side)
+            i, j = self.currencies.index(base), self.currencies.index(quote)
+            self._pairs[key] = pd.Series(num[:, i] / den[:, j], index=self.index, name=f"{base}/{quote}")
+        return self._pairs[key]
+
+    def matrix(self, side="Compra", at=-1):
+        """Matriz N×N (linhas = base, colunas = cotada) em um instante do painel"""
+        num, den = self._sides(side)
+        values = num[at][:, None] / den[at][None, :]
+        return pd.DataFrame(values, index=self.currencies, columns=self.currencies)
+
+    def __sizeof__(self):
+        pairs = sum(s.memory_usage(deep=True) for s in self._pairs.values())
+        return object.__sizeof__(self) + self._compra.nbytes + self._venda.nbytes + pairs
@@ -0,0 +1,103 @@
+import threading
+
+import pandas as pd
+
+from schema import CURRENCIES, categorical
+
+# — Agregados diários mantidos de forma incremental por (moeda, dia) —
+STAT_COLUMNS = ["Compra_Inicial", "Compra_Final", "Compra_Min", "Compra_Max", "Compra_Media",
+                "Venda_Inicial", "Venda_Final", "Venda_Min", "Venda_Max", "Venda_Media"]
+VAR_COLUMNS = ["Compra_Var_Dia", "Compra_Var_Max", "Compra_Var_Min",
+               "Venda_Var_Dia", "Venda_Var_Max", "Venda_Var_Min"]
+
+
+def aggregate_days(quotes):
+    """Agrega as cotações de uma moeda por dia (índice Dia) com as variações"""
+    ordered = quotes.sort_values("dataHoraCotacao", kind="stable")
+    stats = ordered.groupby("Dia").agg(
+        Compra_Inicial=("cotacaoCompra", "first"),
+        Compra_Final=("cotacaoCompra", "last"),
+        Compra_Min=("cotacaoCompra", "min"),
+        Compra_Max=("cotacaoCompra", "max"),
+        Compra_Media=("cotacaoCompra", "mean"),
+        Venda_Inicial=("cotacaoVenda", "first"),
+        Venda_Final=("cotacaoVenda", "last"),
+        Venda_Min=("cotacaoVenda", "min"),
+        Venda_Max=("cotacaoVenda", "max"),
+        Venda_Media=("cotacaoVenda", "mean"),
+    )
+    for t in ["Compra", "Venda"]:
+        base = stats[f"{t}_Inicial"]
+        stats[f"{t}_Var_Dia"] = (stats[f"{t}_Final"] - base) / base * 100
+        stats[f"{t}_Var_Max"] = (stats[f"{t}_Max"] - base) / base * 100
+        stats[f"{t}_Var_Min"] = (stats[f"{t}_Min"] - base) / base * 100
+    return stats
+
+
+def upsert_rows(current, new):
+    """Substitui/acrescenta em `current` as linhas de `new` (índice ordenado)"""
+    if current is None or current.empty:
+        return new
+    if new.index.isin(current.index).all():
+        # Caso comum: novo boletim de hoje, atualiza a linha no lugar
+        for col in new.columns:
+            current.loc[new.index, col] = new[col]
+        return current
+    if new.index.min() > current.index.max():
+        return pd.concat([current, new])
+    return pd.concat([current.drop(index=new.index, errors="ignore"), new]).sort_index()
+
+
+class DailyAggregates:
+    """
+    Guarda, por moeda, uma linha de estatísticas por dia. update() recebe
+    apenas as cotações recém-carregadas (sempre dias completos) e recalcula
+    somente esses dias, então o custo é proporcional aos dados novos e não
+    ao período exibido. Os ouvintes em `listeners` recebem (moeda, dias
+    atualizados) para manter agregações de nível superior.
+    """
+
+    def __init__(self):
+        self._frames = {}
+        self._lock = threading.Lock()
+        self.listeners = []
+
+    def update(self, code, quotes):
+        if quotes is None or quotes.empty:
+            return
+        new = aggregate_days(quotes)
+        with self._lock:
+            self._frames[code] = upsert_rows(self._frames.get(code), new)
+        for listener in self.listeners:
+            listener(code, new.index)
+
+    def between(self, code, start, end):
+        """Cópia das estatísticas diárias da moeda entre start e end (índice Dia)"""
+        with self._lock:
+            current = self._frames.get(code)
+            return None if current is None else current.loc[start:end].copy()
+
+    def get(self, codes, start_date, end_date):
+        """Monta o daily_stats (Moeda, Dia, estatísticas) das moedas no período"""
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        frames = []
+        with self._lock:
+            for code in codes:
+                current = self._frames.get(code)
+                if current is None or current.empty:
+                    continue
+                part = current.loc[start:end].reset_index()
+                part.insert(0, "Moeda", code)
+                frames.append(part)
+        if not frames:
+            return pd.DataFrame()
+        daily_stats = pd.concat(frames, ignore_index=True)
+        daily_stats["Moeda"] = categorical(daily_stats["Moeda"], CURRENCIES)
+        return daily_stats[["Moeda", "Dia"] + STAT_COLUMNS + VAR_COLUMNS]
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+
+daily_aggregates = DailyAggregates()
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+
+# — Redução de pontos (decimação) antes de enviar séries ao navegador —
+# Largura de referência do gráfico em pixels: no máximo ~1 ponto por pixel por série
+CHART_WIDTH_PX = int(os.environ.get("PTAX_CHART_WIDTH", "1400"))
+# Acima deste total de pontos o gráfico passa a usar Scattergl (WebGL)
+WEBGL_THRESHOLD = 2000
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: escolhe n_out índices preservando o
+    formato visual da série. x e y são arrays numéricos ordenados por x.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            avg_x = x[hi:edges[i + 2]].mean()
+            avg_y = y[hi:edges[i + 2]].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(x, y, n_out):
+    """Mantém o mínimo e o máximo de cada balde (n_out/2 baldes), na ordem de x"""
+    n = len(y)
+    buckets = n_out // 2
+    if n_out >= n or buckets < 1:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    picked = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            segment = y[lo:hi]
+            picked.extend((lo + int(np.argmin(segment)), lo + int(np.argmax(segment))))
+    return np.unique(picked)
+
+
+METHODS = {"LTTB": lttb, "Mín/Máx": minmax}
+
+
+def decimate(df, x_col, y_col, n_out=CHART_WIDTH_PX, method="LTTB"):
+    """Reduz um DataFrame ordenado por x_col a no máximo ~n_out linhas"""
+    if len(df) <= n_out:
+        return df
+    x = df[x_col].to_numpy()
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = (x - x[0]).astype("timedelta64[ns]").astype(np.int64)
+    return df.iloc[METHODS[method](x, df[y_col].to_numpy(), n_out)]
@@ -0,0 +1,163 @@
+import io
+import os
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+
+from frame_cache import FrameCache
+
+# — Exportação em pedaços (CSV, Parquet, XLSX) com cache dos arquivos gerados —
+EXPORT_CACHE_MB = int(os.environ.get("PTAX_EXPORT_CACHE_MB", "128"))
+CHUNK_ROWS = 50_000
+XLSX_MAX_ROWS = 1_048_576
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+def iter_chunks(df, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_csv(df, f, chunk_rows=CHUNK_ROWS):
+    """Grava o CSV pedaço a pedaço: só um bloco de texto existe por vez"""
+    for i, chunk in enumerate(iter_chunks(df, chunk_rows)):
+        f.write(chunk.to_csv(index=False, header=i == 0).encode("utf-8"))
+    if df.empty:
+        f.write(df.to_csv(index=False).encode("utf-8"))
+
+
+def write_parquet(df, f, chunk_rows=CHUNK_ROWS):
+    """
+    Converte o frame para Arrow sem copiar as colunas numéricas (categóricos
+    viram dicionários) e grava um row group por lote.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(f, table.schema, compression="zstd") as writer:
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            writer.write_batch(batch)
+
+
+def excel_columns(df):
+    """
+    Converte cada coluna uma vez, de forma vetorizada, para o tipo que o
+    XlsxWriter grava direto: datas viram o número serial do Excel e o resto
+    vira float ou texto. Devolve [(tipo, valores)], com None nos nulos.
+    """
+    columns = []
+    for _, col in df.items():
+        if pd.api.types.is_datetime64_any_dtype(col):
+            kind, data = "date", (col - EXCEL_EPOCH) / pd.Timedelta(days=1)
+        elif pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+            kind, data = "number", col
+        else:
+            kind, data = "string", col
+        values = data.astype(object).where(col.notna(), None).tolist()
+        if kind == "string":
+            values = [None if v is None else str(v) for v in values]
+        columns.append((kind, values))
+    return columns
+
+
+def write_xlsx(tables, f, chunk_rows=CHUNK_ROWS):
+    """
+    Uma aba por tabela ({nome: frame}). Usa o modo constant_memory do
+    XlsxWriter, que grava cada linha em arquivo temporário assim que é
+    escrita; tabelas maiores que o limite do Excel continuam em novas abas.
+    """
+    workbook = xlsxwriter.Workbook(f, {"constant_memory": True})
+    header = workbook.add_format({"bold": True})
+    date_format = workbook.add_format({"num_format": "dd/mm/yyyy hh:mm"})
+
+    def add_sheet(title, columns):
+        sheet = workbook.add_worksheet(title)
+        sheet.set_column(0, max(len(columns) - 1, 0), 16)
+        sheet.write_row(0, 0, columns, header)
+        return sheet
+
+    for name, df in tables.items():
+        columns = [str(c) for c in df.columns]
+        sheet, part, row = add_sheet(name[:31], columns), 1, 1
+        for chunk in iter_chunks(df, chunk_rows):
+            converted = excel_columns(chunk)
+            for i in range(len(chunk)):
+                if row == XLSX_MAX_ROWS:
+                    part += 1
+                    sheet, row = add_sheet(f"{name[:26]} ({part})", columns), 1
+                for j, (kind, values) in enumerate(converted):
+                    value = values[i]
+                    if value is None:
+                        continue
+                    if kind == "number":
+                        sheet.write_number(row, j, value)
+                    elif kind == "date":
+                        sheet.write_number(row, j, value, date_format)
+                    else:
+                        sheet.write_string(row, j, value)
+                row += 1
+    workbook.close()
+
+
+def build_export(tables, fmt):
+    """
+    Gera o arquivo de exportação em memória. CSV e Parquet com mais de uma
+    tabela saem num ZIP com um arquivo por tabela; no Excel cada tabela é
+    uma aba. Devolve (bytes, extensão, mime).
+    """
+    ext, mime = FORMATS[fmt]
+    buf = io.BytesIO()
+    if fmt == "Excel":
+        write_xlsx(tables, buf)
+    elif len(tables) == 1:
+        (df,) = tables.values()
+        (write_csv if fmt == "CSV" else write_parquet)(df, buf)
+    else:
+        with zipfile.ZipFile(buf, "w") as zf:
+            for name, df in tables.items():
+                if fmt == "CSV":
+                    with zf.open(f"{name}.csv", "w", force_zip64=True) as member:
+                        write_csv(df, member)
+                else:
+                    # Parquet já é comprimido; vai para o ZIP sem recompressão
+                    part = io.BytesIO()
+                    write_parquet(df, part)
+                    zf.writestr(f"{name}.parquet", part.getvalue())
+        ext, mime = "zip", "application/zip"
+    return buf.getvalue(), ext, mime
+
+
+class ExportCache:
+    """
+    Guarda os arquivos gerados por (versão dos dados, período, formato,
+    tabelas incluídas); downloads repetidos não reprocessam nada e pedidos
+    simultâneos iguais geram o arquivo uma só vez. A chave deve usar a mesma
+    versão com que as tabelas foram carregadas, senão um arquivo antigo fica
+    guardado sob a versão nova.
+    """
+
+    def __init__(self, max_bytes=EXPORT_CACHE_MB * 1024 * 1024):
+        self.entries = FrameCache(max_bytes, name="exportações")
+
+    def _build(self, key, load_tables, fmt):
+        artifact = build_export(load_tables(), fmt)
+        self.entries.put(key, artifact)
+        return artifact
+
+    def get(self, key, load_tables, fmt):
+        """load_tables() só é chamada quando o arquivo ainda não está em cache"""
+        key = (fmt,) + key
+        artifact = self.entries.get(key)
+        if artifact is None:
+            artifact = self.entries.inflight.do(key, self._build, key, load_tables, fmt)
+        return artifact
+
+
+export_cache = ExportCache()
@@ -0,0 +1,52 @@
+import os
+
+from frame_cache import FrameCache, sizeof
+
+# — Cache de gráficos Plotly já montados, compartilhado entre sessões —
+FIGURE_CACHE_MB = int(os.environ.get("PTAX_FIGURE_CACHE_MB", "64"))
+# Propriedades dos traços que guardam os dados (o que domina o tamanho)
+DATA_PROPS = ("x", "y", "z", "customdata", "text")
+
+
+def figure_size(fig):
+    """Bytes aproximados da figura: soma dos arrays de dados de cada traço"""
+    total = 0
+    for trace in fig.data:
+        for prop in DATA_PROPS:
+            value = getattr(trace, prop, None)
+            if value is not None:
+                total += sizeof(value)
+    return total
+
+
+class FigureStore:
+    """
+    Guarda cada gráfico já montado, indexado por (tipo de gráfico, versão dos
+    dados, moedas, período, tipo de cotação, nível de análise, ...). A versão
+    vem de quote_cache.version(), a mesma usada na chave do load_data, então
+    boletins novos geram chaves novas e as antigas saem pelo LRU. O tamanho
+    de cada entrada é estimado pelos arrays de dados dos traços.
+
+    A figura devolvida é compartilhada: quem chama não deve alterá-la.
+    """
+
+    def __init__(self, max_bytes=FIGURE_CACHE_MB * 1024 * 1024):
+        self.entries = FrameCache(max_bytes, name="gráficos")
+
+    def _build(self, key, build):
+        fig = build()
+        self.entries.put(key, fig, size=figure_size(fig))
+        return fig
+
+    def get(self, key, build):
+        """Devolve a figura da chave, chamando build() só na primeira vez"""
+        fig = self.entries.get(key)
+        if fig is None:
+            fig = self.entries.inflight.do(key, self._build, key, build)
+        return fig
+
+    def clear(self):
+        self.entries.clear()
+
+
+figure_store = FigureStore()
@@ -0,0 +1,130 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from singleflight import SingleFlight
+
+# — Cache LRU limitado por memória (bytes reais dos DataFrames) —
+DATA_CACHE_MB = int(os.environ.get("PTAX_CACHE_MB", "256"))
+
+
+def sizeof(value):
+    """Estima o consumo de memória de um valor em cache"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+def shallow_copy(value):
+    """Cópia rasa de DataFrames para que colunas adicionadas não alterem o cache"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, tuple):
+        return tuple(shallow_copy(v) for v in value)
+    return value
+
+
+class FrameCache:
+    """
+    Cache LRU com orçamento em bytes. Cada entrada é medida ao ser inserida;
+    quando o total passa de max_bytes, as menos usadas recentemente são
+    descartadas. Mantém contadores de acertos, faltas e descartes.
+    """
+
+    def __init__(self, max_bytes, name="cache"):
+        self.max_bytes = max_bytes
+        self.name = name
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Fica no cache (e não no decorador) porque o script é reexecutado a cada rerun
+        self.inflight = SingleFlight()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, expires = entry
+                if expires is None or time.monotonic() < expires:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def put(self, key, value, ttl=None, size=None):
+        """Insere o valor; `size` (bytes) dispensa a medição por sizeof()"""
+        if size is None:
+            size = sizeof(value)
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, expires)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entradas": len(self._entries),
+                "bytes": self.total_bytes,
+                "limite": self.max_bytes,
+                "acertos": self.hits,
+                "faltas": self.misses,
+                "descartes": self.evictions,
+            }
+
+
+def cached(cache, ttl=None):
+    """
+    Decorador que memoriza o resultado da função no FrameCache informado.
+    Chamadas simultâneas com os mesmos argumentos executam a função uma só vez.
+    """
+    def decorator(func):
+        def compute(key, args):
+            value = func(*args)
+            cache.put(key, value, ttl=ttl)
+            return value
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = (func.__name__,) + tuple(tuple(a) if isinstance(a, list) else a for a in args)
+            value = cache.get(key)
+            if value is None:
+                value = cache.inflight.do(key, compute, key, args)
+            return shallow_copy(value)
+        return wrapper
+    return decorator
+
+
+data_cache = FrameCache(DATA_CACHE_MB * 1024 * 1024, name="dados")
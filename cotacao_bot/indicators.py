@@ -0,0 +1,186 @@
+import copy
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# — Indicadores técnicos incrementais (SMA, EWMA, volatilidade, drawdown) —
+PERIODS_PER_YEAR = {"Diário": 252, "Intradiário": 252 * 5}
+
+
+class RollingMean:
+    """Média móvel simples com soma corrente"""
+
+    def __init__(self, window, **_):
+        self.window = window
+        self.buf = deque(maxlen=window)
+        self.total = 0.0
+
+    def push(self, x):
+        if len(self.buf) == self.window:
+            self.total -= self.buf[0]
+        self.buf.append(x)
+        self.total += x
+        return self.total / self.window if len(self.buf) == self.window else np.nan
+
+    def batch(self, values):
+        out = np.full(len(values), np.nan)
+        w = self.window
+        if len(values) >= w:
+            csum = np.concatenate([[0.0], np.cumsum(values)])
+            out[w - 1:] = (csum[w:] - csum[:-w]) / w
+        self.buf.extend(values[-w:])
+        self.total = float(np.sum(self.buf))
+        return out
+
+
+class Ewma:
+    """Média móvel exponencial (span = janela, sem ajuste de viés)"""
+
+    def __init__(self, window, **_):
+        self.alpha = 2 / (window + 1)
+        self.value = None
+
+    def push(self, x):
+        self.value = x if self.value is None else self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+    def batch(self, values):
+        if len(values) == 0:
+            return np.empty(0)
+        out = pd.Series(values).ewm(alpha=self.alpha, adjust=False).mean().to_numpy()
+        self.value = out[-1]
+        return out
+
+
+class RealizedVolatility:
+    """Volatilidade realizada anualizada (%) dos log-retornos na janela"""
+
+    def __init__(self, window, periods_per_year=252):
+        self.window = window
+        self.scale = np.sqrt(periods_per_year) * 100
+        self.prev = None
+        self.buf = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def _std(self):
+        w = self.window
+        var = (self.total_sq - self.total ** 2 / w) / (w - 1)
+        return np.sqrt(max(var, 0.0)) * self.scale
+
+    def push(self, x):
+        if self.prev is None:
+            self.prev = x
+            return np.nan
+        r = np.log(x / self.prev)
+        self.prev = x
+        if len(self.buf) == self.window:
+            old = self.buf[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.buf.append(r)
+        self.total += r
+        self.total_sq += r * r
+        return self._std() if len(self.buf) == self.window else np.nan
+
+    def batch(self, values):
+        out = np.full(len(values), np.nan)
+        if len(values) == 0:
+            return out
+        returns = np.log(values[1:] / values[:-1])
+        w = self.window
+        if len(returns) >= w:
+            s1 = np.concatenate([[0.0], np.cumsum(returns)])
+            s2 = np.concatenate([[0.0], np.cumsum(returns * returns)])
+            total = s1[w:] - s1[:-w]
+            total_sq = s2[w:] - s2[:-w]
+            var = np.clip((total_sq - total ** 2 / w) / (w - 1), 0, None)
+            out[w:] = np.sqrt(var) * self.scale
+        self.prev = values[-1]
+        self.buf.extend(returns[-w:])
+        self.total = float(np.sum(self.buf))
+        self.total_sq = float(np.sum(np.square(self.buf)))
+        return out
+
+
+class Drawdown:
+    """Queda (%) em relação ao pico corrente; o mínimo da série é o drawdown máximo"""
+
+    def __init__(self, window=None, **_):
+        self.peak = -np.inf
+
+    def push(self, x):
+        self.peak = max(self.peak, x)
+        return (x / self.peak - 1) * 100
+
+    def batch(self, values):
+        if len(values) == 0:
+            return np.empty(0)
+        peaks = np.maximum.accumulate(np.maximum(values, self.peak))
+        self.peak = peaks[-1]
+        return (values / peaks - 1) * 100
+
+
+INDICATORS = {
+    "SMA": RollingMean,
+    "EWMA": Ewma,
+    "Volatilidade": RealizedVolatility,
+    "Drawdown": Drawdown,
+}
+
+
+class _SeriesState:
+    def __init__(self, indicator):
+        self.indicator = indicator
+        self.first_ts = None
+        self.last_ts = None
+        self.count = 0
+        self.outputs = np.empty(0)
+
+
+class IndicatorEngine:
+    """
+    Mantém o estado de cada (série, indicador, janela). Todos os pontos,
+    exceto o último, são consolidados no estado; o último é tratado como
+    provisório (o fechamento de hoje ainda pode mudar) e recalculado sobre
+    uma cópia. Assim, quando chegam boletins novos só os pontos novos são
+    processados; a inicialização do histórico é vetorizada.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def compute(self, key, series, indicator, window, periods_per_year=252):
+        """series: pd.Series indexada por data/hora, em ordem crescente"""
+        if series.empty:
+            return pd.Series(dtype=float)
+        values = series.to_numpy(dtype=np.float64)
+        index = series.index
+        state_key = (key, indicator, window, periods_per_year)
+        with self._lock:
+            state = self._states.get(state_key)
+            valid = (
+                state is not None
+                and state.first_ts == index[0]
+                and 0 < state.count < len(index)
+                and index[state.count - 1] == state.last_ts
+            )
+            if not valid:
+                state = _SeriesState(INDICATORS[indicator](window, periods_per_year=periods_per_year))
+                state.outputs = state.indicator.batch(values[:-1])
+            else:
+                new = [state.indicator.push(x) for x in values[state.count:-1]]
+                state.outputs = np.concatenate([state.outputs, new])
+            state.first_ts = index[0]
+            state.count = len(index) - 1
+            state.last_ts = index[state.count - 1] if state.count else None
+            self._states[state_key] = state
+            provisional = copy.deepcopy(state.indicator).push(values[-1])
+            outputs = np.append(state.outputs, provisional)
+        return pd.Series(outputs, index=index, name=indicator)
+
+
+indicator_engine = IndicatorEngine()
@@ -0,0 +1,101 @@
+import os
+import queue
+import threading
+from collections import deque
+
+from mailer import make_transport
+
+# — Fila de envio de e-mails (um worker por processo) —
+MAIL_BATCH_SIZE = int(os.environ.get("PTAX_MAIL_BATCH_SIZE", "50"))
+# Conexão do transporte é fechada após esse tempo sem mensagens
+MAIL_IDLE_SECONDS = 60
+
+
+class MailJob:
+    """Um relatório já renderizado e a lista de destinatários que deve recebê-lo"""
+
+    def __init__(self, recipients, subject, body):
+        self.recipients = list(dict.fromkeys(recipients))
+        self.subject = subject
+        self.body = body
+        self.sent = 0
+        self.failed = []
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def status(self):
+        if not self.done.is_set():
+            return f"⏳ Enviando ({self.sent}/{len(self.recipients)})"
+        if self.failed:
+            _, error = self.failed[-1]
+            return f"❌ {len(self.failed)} de {len(self.recipients)} falharam: {error}"
+        return f"✅ Enviado para {self.sent} destinatário(s)"
+
+
+class MailQueue:
+    """
+    Worker único que consome os relatórios da fila. Cada corpo é renderizado
+    uma vez por quem submete; o worker divide os destinatários em lotes de
+    `batch_size` (um envio por lote, em cópia oculta) e mantém o transporte
+    aberto entre mensagens. Quem submete não espera o envio.
+    """
+
+    def __init__(self, transport_factory=make_transport, batch_size=MAIL_BATCH_SIZE,
+                 idle_seconds=MAIL_IDLE_SECONDS):
+        self.transport_factory = transport_factory
+        self.batch_size = batch_size
+        self.idle_seconds = idle_seconds
+        self.errors = deque(maxlen=20)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, recipients, subject, body):
+        """Enfileira o relatório e devolve o MailJob para acompanhar o envio"""
+        job = MailJob(recipients, subject, body)
+        self._queue.put(job)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="ptax-mail")
+                self._thread.start()
+        return job
+
+    def _deliver(self, transport, job):
+        for start in range(0, len(job.recipients), self.batch_size):
+            batch = job.recipients[start:start + self.batch_size]
+            try:
+                if transport is None:
+                    transport = self.transport_factory()
+                transport.send(batch, job.subject, job.body)
+                job.sent += len(batch)
+            except Exception as e:
+                job.failed.extend((r, e) for r in batch)
+                self.errors.append(e)
+                # Descarta a conexão com problema; o próximo lote abre outra
+                if transport is not None:
+                    try:
+                        transport.close()
+                    except Exception:
+                        pass
+                transport = None
+        return transport
+
+    def _run(self):
+        transport = None
+        while True:
+            try:
+                job = self._queue.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                if transport is not None:
+                    transport.close()
+                    transport = None
+                continue
+            try:
+                transport = self._deliver(transport, job)
+            finally:
+                job.done.set()
+
+
+mail_queue = MailQueue()
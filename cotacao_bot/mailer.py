@@ -0,0 +1,200 @@
+import os
+import smtplib
+import uuid
+from datetime import datetime
+from email.message import EmailMessage
+
+# — Montagem dos e-mails de relatório e transportes de envio (sem Streamlit) —
+MAIL_TRANSPORT = os.environ.get("PTAX_MAIL_TRANSPORT", "outlook")
+SMTP_HOST = os.environ.get("PTAX_SMTP_HOST", "localhost")
+SMTP_PORT = int(os.environ.get("PTAX_SMTP_PORT", "587"))
+SMTP_USER = os.environ.get("PTAX_SMTP_USER", "")
+SMTP_PASSWORD = os.environ.get("PTAX_SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.environ.get("PTAX_SMTP_STARTTLS", "1") == "1"
+SMTP_FROM = os.environ.get("PTAX_SMTP_FROM", SMTP_USER)
+MAIL_DIR = os.environ.get(
+    "PTAX_MAIL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "mail")
+)
+
+
+def render_report(df, subject, analysis_text=""):
+    """HTML do relatório: tabela formatada, análise e rodapé"""
+    # Create styled HTML table
+    html = df.to_html(
+        index=False, border=0, justify="center",
+        classes="table table-striped table-bordered",
+        formatters={
+            "Compra (R$)": lambda x: f"R$ {x:.4f}",
+            "Venda (R$)": lambda x: f"R$ {x:.4f}",
+            "Variação (%)": lambda x: f"{x:.2f}%",
+            "Média Compra (R$)": lambda x: f"R$ {x:.4f}",
+            "Média Venda (R$)": lambda x: f"R$ {x:.4f}"
+        }
+    )
+    
+    body = f"""
+    <html>
+    <head>
+    <style>
+      body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+      .container {{ max-width: 900px; margin: 0 auto; padding: 20px; }}
+      h1 {{ color: #2c3e50; border-bottom: 2px solid #4CAF50; padding-bottom: 10px; }}
+      .table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
+      .table th {{ background-color: #4CAF50; color: white; padding: 10px; text-align: left; }}
+      .table td {{ padding: 8px; border: 1px solid #ddd; }}
+      .table tr:nth-child(even) {{ background-color: #f2f2f2; }}
+      .analysis {{ background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin-top: 20px; }}
+      .footer {{ margin-top: 30px; font-size: 0.8em; color: #777; text-align: center; }}
+      .positive {{ color: #28a745; font-weight: bold; }}
+      .negative {{ color: #dc3545; font-weight: bold; }}
+    </style>
+    </head>
+    <body>
+    <div class="container">
+      <h1>📊 Relatório de Cotações PTAX</h1>
+      <h2>{subject}</h2>
+      {html}
+      <div class="analysis">
+        <h3>Análise</h3>
+        <p>{analysis_text}</p>
+      </div>
+      <div class="footer">
+        <p>Relatório gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>
+      </div>
+    </div>
+    </body>
+    </html>
+    """
+    return body
+
+
+class OutlookTransport:
+    """
+    Outlook via COM. A aplicação é aberta uma vez e reaproveitada; como
+    objetos COM pertencem à thread que os criou, open/send/close devem
+    rodar na mesma thread (a do worker da fila).
+    """
+
+    def __init__(self):
+        self._outlook = None
+
+    def open(self):
+        if self._outlook is None:
+            # Importado aqui: só existe no Windows com o Outlook instalado
+            import pythoncom
+            import win32com.client as win32
+            pythoncom.CoInitialize()
+            self._outlook = win32.Dispatch("outlook.application")
+
+    def send(self, recipients, subject, body):
+        self.open()
+        mail = self._outlook.CreateItem(0)
+        if len(recipients) == 1:
+            mail.To = recipients[0]
+        else:
+            mail.BCC = "; ".join(recipients)
+        mail.Subject = subject
+        mail.HTMLBody = body
+        mail.Send()
+
+    def close(self):
+        if self._outlook is not None:
+            import pythoncom
+            self._outlook = None
+            pythoncom.CoUninitialize()
+
+
+def build_message(sender, recipients, subject, body):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = sender
+    # Um destinatário vai no To; lotes vão só no envelope (cópia oculta)
+    msg["To"] = recipients[0] if len(recipients) == 1 else sender
+    msg.set_content("Este relatório requer um cliente de e-mail com suporte a HTML.")
+    msg.add_alternative(body, subtype="html")
+    return msg
+
+
+class SmtpTransport:
+    """
+    SMTP com a conexão (e o login) reaproveitada entre mensagens. Cada lote
+    é uma única transação com vários destinatários no envelope. Se o
+    servidor derrubar a conexão ociosa, ela é reaberta uma vez.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER,
+                 password=SMTP_PASSWORD, starttls=SMTP_STARTTLS, sender=SMTP_FROM):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender or "ptax@localhost"
+        self._smtp = None
+
+    def open(self):
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+            self._smtp = smtp
+
+    def send(self, recipients, subject, body):
+        msg = build_message(self.sender, recipients, subject, body)
+        for attempt in range(2):
+            self.open()
+            try:
+                self._smtp.send_message(msg, to_addrs=recipients)
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._smtp = None
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+
+
+class FileTransport:
+    """Grava cada lote como arquivo .eml em MAIL_DIR (testes e depuração)"""
+
+    def __init__(self, directory=MAIL_DIR, sender=SMTP_FROM):
+        self.directory = directory
+        self.sender = sender or "ptax@localhost"
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    def send(self, recipients, subject, body):
+        self.open()
+        msg = build_message(self.sender, recipients, subject, body)
+        msg["X-Envelope-To"] = ", ".join(recipients)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.eml"
+        with open(os.path.join(self.directory, name), "wb") as f:
+            f.write(msg.as_bytes())
+
+    def close(self):
+        pass
+
+
+TRANSPORTS = {
+    "outlook": OutlookTransport,
+    "smtp": SmtpTransport,
+    "file": FileTransport,
+}
+
+
+def make_transport(name=MAIL_TRANSPORT):
+    """Transporte configurado em PTAX_MAIL_TRANSPORT (outlook, smtp ou file)"""
+    try:
+        return TRANSPORTS[name]()
+    except KeyError:
+        raise ValueError(f"Transporte de e-mail desconhecido: {name}") from None
@@ -0,0 +1,63 @@
+import pandas as pd
+
+# — Indicadores por moeda calculados em uma única passada agrupada —
+
+
+def compute_metrics(df):
+    """
+    Calcula, por moeda, cotação inicial/final, mínima, máxima e variação no
+    período (compra e venda) com um único groupby. A primeira e a última
+    cotação saem de idxmin/idxmax em dataHoraCotacao, sem reordenar o frame.
+    Devolve um DataFrame com uma linha por moeda, na ordem das categorias
+    de Moeda.
+    """
+    if df.empty:
+        return pd.DataFrame()
+    if not df.index.is_unique:
+        df = df.reset_index(drop=True)
+    grouped = df.groupby("Moeda", observed=True)
+    extremes = grouped.agg(
+        Compra_Min=("cotacaoCompra", "min"),
+        Compra_Max=("cotacaoCompra", "max"),
+        Venda_Min=("cotacaoVenda", "min"),
+        Venda_Max=("cotacaoVenda", "max"),
+    )
+    first = grouped["dataHoraCotacao"].idxmin()
+    last = grouped["dataHoraCotacao"].idxmax()
+    columns = ["cotacaoCompra", "cotacaoVenda", "dataHoraCotacao"]
+    initial = df.loc[first.values, columns].set_axis(first.index)
+    final = df.loc[last.values, columns].set_axis(last.index)
+    metrics = pd.DataFrame({
+        "Compra_Inicial": initial["cotacaoCompra"],
+        "Compra_Final": final["cotacaoCompra"],
+        "Compra_Min": extremes["Compra_Min"],
+        "Compra_Max": extremes["Compra_Max"],
+        "Venda_Inicial": initial["cotacaoVenda"],
+        "Venda_Final": final["cotacaoVenda"],
+        "Venda_Min": extremes["Venda_Min"],
+        "Venda_Max": extremes["Venda_Max"],
+        "Data_Inicial": initial["dataHoraCotacao"],
+        "Data_Final": final["dataHoraCotacao"],
+    })
+    for t in ["Compra", "Venda"]:
+        metrics[f"{t}_Var"] = (metrics[f"{t}_Final"] - metrics[f"{t}_Inicial"]) / metrics[f"{t}_Inicial"] * 100
+    return metrics.reset_index()
+
+
+def latest_quotes(metrics_df):
+    """Última cotação de cada moeda, no formato de exibição/e-mail"""
+    if metrics_df.empty:
+        return pd.DataFrame(columns=["Moeda", "Data/Hora", "Compra (R$)", "Venda (R$)"])
+    return pd.DataFrame({
+        "Moeda": metrics_df["Moeda"].astype(str),
+        "Data/Hora": metrics_df["Data_Final"].dt.strftime("%d/%m/%Y %H:%M"),
+        "Compra (R$)": metrics_df["Compra_Final"],
+        "Venda (R$)": metrics_df["Venda_Final"],
+    })
+
+
+def email_table(metrics_df, side="Compra"):
+    """Tabela do e-mail: última cotação e variação de `side` (Compra ou Venda) no período"""
+    table = latest_quotes(metrics_df)
+    table["Variação (%)"] = metrics_df[f"{side}_Var"] if not metrics_df.empty else pd.Series(dtype=float)
+    return table
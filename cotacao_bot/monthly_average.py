@@ -0,0 +1,145 @@
+import calendar
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from olinda import fetch_many
+from ptax_store import STORE_DIR, store
+from schema import CURRENCIES, categorical
+
+# — Média mensal PTAX (média dos fechamentos diários, truncada) com meses encerrados memorizados —
+MONTHLY_FILE = os.environ.get("PTAX_MONTHLY_FILE", os.path.join(STORE_DIR, "_monthly_averages.parquet"))
+DECIMALS = 4
+COLUMNS = ["Moeda", "Mes", "Compra", "Venda", "Dias"]
+
+
+def truncate(values, decimals=DECIMALS):
+    """Trunca (não arredonda) as casas decimais, como na divulgação da PTAX média"""
+    factor = 10 ** decimals
+    return np.trunc(np.asarray(values, dtype=float) * factor) / factor
+
+
+def last_business_day(year, month):
+    """Último dia útil (segunda a sexta) do mês"""
+    day = date(year, month, calendar.monthrange(year, month)[1])
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def closing_quotes(df):
+    """Última cotação de cada (moeda, dia): o fechamento PTAX do dia"""
+    return (df.sort_values("dataHoraCotacao", kind="stable")
+              .drop_duplicates(["Moeda", "Dia"], keep="last")
+              .sort_values(["Moeda", "Dia"], kind="stable")
+              .reset_index(drop=True))
+
+
+def monthly_averages(df):
+    """
+    Média mensal de compra e venda de todas as moedas e meses do frame em
+    uma passada: fechamento de cada dia, média simples dos dias do mês e
+    truncamento em DECIMALS casas. Mes é o primeiro dia do mês.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    closing = closing_quotes(df)
+    months = closing["Dia"].dt.to_period("M").dt.start_time.rename("Mes")
+    result = closing.groupby(["Moeda", months], observed=True).agg(
+        Compra=("cotacaoCompra", "mean"),
+        Venda=("cotacaoVenda", "mean"),
+        Dias=("Dia", "size"),
+    ).reset_index()
+    result["Compra"] = truncate(result["Compra"])
+    result["Venda"] = truncate(result["Venda"])
+    return result[COLUMNS]
+
+
+class MonthlyAverages:
+    """
+    Médias mensais por (moeda, mês). Um mês encerrado nunca muda, então sua
+    média é calculada uma vez e guardada em MONTHLY_FILE (inclusive meses
+    sem cotação, com Dias = 0): consultas posteriores são buscas num dict,
+    sem ler o armazenamento. Só o mês corrente é recalculado a cada chamada.
+    """
+
+    def __init__(self, path=MONTHLY_FILE, loader=store.get):
+        self.path = path
+        self.loader = loader
+        self._closed = None
+        self._lock = threading.Lock()
+
+    def _memo(self):
+        if self._closed is None:
+            self._closed = {}
+            if os.path.exists(self.path):
+                saved = pd.read_parquet(self.path)
+                for code, month, compra, venda, days in saved[COLUMNS].itertuples(index=False):
+                    self._closed[(code, month)] = (compra, venda, days)
+        return self._closed
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        rows = [(code, month) + values for (code, month), values in self._closed.items()]
+        df = pd.DataFrame(rows, columns=COLUMNS).sort_values(["Moeda", "Mes"])
+        tmp = self.path + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, self.path)
+
+    def _compute(self, missing, current):
+        """Calcula os pares (moeda, mês) que faltam numa leitura por moeda"""
+        codes = sorted({code for code, _ in missing})
+        months = [month for _, month in missing]
+        end = min((max(months) + pd.offsets.MonthEnd(0)).date(), date.today())
+        results, errors = fetch_many(self.loader, codes, min(months).date(), end)
+        frames = [results[c] for c in codes if c in results and not results[c].empty]
+        computed = monthly_averages(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame())
+        values = {(code, month): (compra, venda, days)
+                  for code, month, compra, venda, days in computed.itertuples(index=False)}
+
+        found, closed = {}, {}
+        for key in missing:
+            code, month = key
+            if code in errors:
+                continue
+            found[key] = values.get(key, (np.nan, np.nan, 0))
+            if month < current:
+                closed[key] = found[key]
+        return found, closed, errors
+
+    def get(self, codes, start_date, end_date):
+        """
+        Médias dos meses de start_date a end_date (limitado ao mês corrente)
+        para as moedas. Retorna (DataFrame com COLUMNS, {moeda: exceção}).
+        """
+        current = pd.Timestamp(date.today()).to_period("M").start_time
+        months = pd.date_range(pd.Timestamp(start_date).to_period("M").start_time,
+                               min(pd.Timestamp(end_date), current), freq="MS")
+        keys = [(code, month) for code in codes for month in months]
+
+        with self._lock:
+            memo = self._memo()
+            found = {key: memo[key] for key in keys if key in memo}
+        missing = [key for key in keys if key not in found]
+
+        errors = {}
+        if missing:
+            computed, closed, errors = self._compute(missing, current)
+            found.update(computed)
+            if closed:
+                with self._lock:
+                    self._memo().update(closed)
+                    self._save()
+
+        rows = [key + found[key] for key in keys if key in found and found[key][2] > 0]
+        result = pd.DataFrame(rows, columns=COLUMNS)
+        result["Moeda"] = categorical(result["Moeda"], CURRENCIES)
+        result["Mes"] = pd.to_datetime(result["Mes"])
+        result["Dias"] = result["Dias"].astype(int)
+        return result, errors
+
+
+monthly = MonthlyAverages()
@@ -0,0 +1,259 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+import pandas as pd
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from schema import PRICE_COLUMNS, to_canonical
+from singleflight import SingleFlight
+
+# — Cliente da API Olinda (PTAX / BCB) —
+BASE_URL = "https://olinda.bcb.gov.br/olinda/servico/PTAX/versao/v1/odata/"
+DATE_FMT = "%m-%d-%Y"
+# Máximo de requisições simultâneas ao Olinda (também limita o pool de conexões)
+MAX_WORKERS = int(os.environ.get("PTAX_MAX_WORKERS", "4"))
+# Tamanho de cada janela de consulta (em meses) e de cada página ($top)
+WINDOW_MONTHS = int(os.environ.get("PTAX_WINDOW_MONTHS", "3"))
+PAGE_SIZE = 1000
+# Tentativas por página (com espera exponencial aleatória) e parâmetros do disjuntor
+RETRY_ATTEMPTS = int(os.environ.get("PTAX_RETRY_ATTEMPTS", "3"))
+BREAKER_THRESHOLD = int(os.environ.get("PTAX_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = int(os.environ.get("PTAX_BREAKER_COOLDOWN", "60"))
+
+_session = None
+_session_lock = threading.Lock()
+# Requisições idênticas em curso são compartilhadas entre sessões/threads
+_inflight = SingleFlight()
+
+
+class CircuitOpenError(RuntimeError):
+    """Levantada quando o disjuntor está aberto e a chamada nem é tentada"""
+
+
+class CircuitBreaker:
+    """
+    Abre após `threshold` falhas seguidas e recusa chamadas por `cooldown`
+    segundos. Passado esse tempo fica meio-aberto: só uma chamada de teste
+    passa e as demais continuam recusadas até o resultado dela. Sucesso
+    fecha o disjuntor, nova falha o reabre por mais `cooldown` segundos.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+                raise CircuitOpenError("API do Banco Central indisponível; novas tentativas suspensas temporariamente")
+            # Meio-aberto: quem chega primeiro faz a chamada de teste
+            self.probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+breaker = CircuitBreaker()
+
+
+def get_session():
+    """Sessão HTTP compartilhada, com keep-alive e pool de conexões limitado"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS, pool_block=True)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+        return _session
+
+
+def as_date(value):
+    """Converte datetime/Timestamp em date"""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def plan_windows(start_date, end_date, months=WINDOW_MONTHS):
+    """Divide o período em janelas de `months` meses alinhadas ao calendário"""
+    start_date, end_date = as_date(start_date), as_date(end_date)
+    windows = []
+    cursor = start_date
+    while cursor <= end_date:
+        m = cursor.month - 1 + months
+        next_start = date(cursor.year + m // 12, m % 12 + 1, 1)
+        window_end = min(end_date, next_start - timedelta(days=1))
+        windows.append((cursor, window_end))
+        cursor = window_end + timedelta(days=1)
+    return windows
+
+
+def build_url(code, start_date, end_date, top, skip=0):
+    """Monta a URL OData paginada ($top/$skip) de cotações por período da moeda"""
+    params = {
+        "@dataInicial": f"'{start_date.strftime(DATE_FMT)}'",
+        "@dataFinalCotacao": f"'{end_date.strftime(DATE_FMT)}'",
+        "$format": "json",
+        "$orderby": "dataHoraCotacao asc",
+        "$top": top,
+        "$skip": skip,
+    }
+    endpoint = "CotacaoDolarPeriodo" if code == "USD" else "CotacaoMoedaPeriodo"
+    if code != "USD":
+        params["@moeda"] = f"'{code}'"
+    url = f"{BASE_URL}{endpoint}("
+    if code == "USD":
+        url += "dataInicial=@dataInicial,dataFinalCotacao=@dataFinalCotacao"
+    else:
+        url += "moeda=@moeda,dataInicial=@dataInicial,dataFinalCotacao=@dataFinalCotacao"
+    url += ")?" + "&".join(f"{k}={v}" for k, v in params.items())
+    return url
+
+
+def normalize_quotes(df, code):
+    """Adiciona as colunas Moeda/Dia e aplica o esquema canônico"""
+    return to_canonical(df, code)
+
+
+def fetch_window(code, start_date, end_date, timeout=15, page_size=PAGE_SIZE):
+    """Busca uma janela; chamadas simultâneas para a mesma janela são coalescidas"""
+    endpoint = "CotacaoDolarPeriodo" if code == "USD" else "CotacaoMoedaPeriodo"
+    key = (endpoint, code, start_date, end_date, page_size)
+    return _inflight.do(key, _fetch_window, code, start_date, end_date, timeout, page_size)
+
+
+def _is_transient(exc):
+    """Falhas de rede, timeouts, 429 e 5xx merecem nova tentativa; 4xx não"""
+    if isinstance(exc, requests.HTTPError):
+        status = exc.response.status_code if exc.response is not None else 0
+        return status == 429 or status >= 500
+    return isinstance(exc, requests.RequestException)
+
+
+def decode_page(payload):
+    """
+    Converte o JSON de uma página OData em (DataFrame, número de registros),
+    montando cada coluna de uma vez: preços direto em float64 e textos em
+    listas, sem o pd.DataFrame(lista de dicts), que percorre os registros
+    inferindo o tipo de cada campo. A página tem no máximo PAGE_SIZE
+    registros, então o json do requests (em C) a decodifica inteira.
+    """
+    records = payload.get("value", [])
+    if not records:
+        return pd.DataFrame(), 0
+    columns = {}
+    for key in records[0]:
+        values = [r.get(key) for r in records]
+        columns[key] = np.array(values, dtype=np.float64) if key in PRICE_COLUMNS else values
+    return pd.DataFrame(columns, copy=False), len(records)
+
+
+@retry(
+    retry=retry_if_exception(_is_transient),
+    stop=stop_after_attempt(RETRY_ATTEMPTS),
+    wait=wait_random_exponential(multiplier=0.5, max=8),
+    reraise=True
+)
+def _request_page(url, timeout):
+    r = get_session().get(url, timeout=timeout)
+    r.raise_for_status()
+    return decode_page(r.json())
+
+
+def get_page(url, timeout):
+    """
+    Busca uma página com novas tentativas, passando pelo disjuntor.
+    Devolve (DataFrame da página, número de registros).
+    """
+    breaker.before_call()
+    try:
+        page = _request_page(url, timeout)
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return page
+
+
+def _fetch_window(code, start_date, end_date, timeout, page_size):
+    """Busca uma janela paginando com $top/$skip até a última página"""
+    pages, skip = [], 0
+    while True:
+        url = build_url(code, start_date, end_date, top=page_size, skip=skip)
+        page, count = get_page(url, timeout)
+        if count:
+            pages.append(page)
+        if count < page_size:
+            break
+        skip += page_size
+    if not pages:
+        return pd.DataFrame()
+    df = pages[0] if len(pages) == 1 else pd.concat(pages, ignore_index=True)
+    return normalize_quotes(df, code)
+
+
+def fetch_windows(code, start_date, end_date, max_workers=MAX_WORKERS):
+    """
+    Busca as janelas do período em paralelo, gerando ((inicio, fim), DataFrame)
+    à medida que cada uma termina. Na primeira falha as janelas ainda na fila
+    são canceladas; as que já estavam em andamento e concluírem são entregues
+    normalmente, e só então a exceção é relançada.
+    """
+    windows = plan_windows(start_date, end_date)
+    if not windows:
+        return
+    failure = None
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as pool:
+        futures = {pool.submit(fetch_window, code, s, e): (s, e) for s, e in windows}
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is None:
+                yield futures[future], future.result()
+            elif failure is None:
+                failure = error
+                for pending in futures:
+                    pending.cancel()
+    if failure is not None:
+        raise failure
+
+
+def fetch_many(fetch, codes, start_date, end_date, max_workers=MAX_WORKERS):
+    """
+    Executa fetch(code, start_date, end_date) para cada moeda em paralelo.
+    Retorna ({moeda: DataFrame}, {moeda: exceção}).
+    """
+    results, errors = {}, {}
+    if not codes:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(codes)))) as pool:
+        futures = {c: pool.submit(fetch, c, start_date, end_date) for c in codes}
+        for c, future in futures.items():
+            try:
+                results[c] = future.result()
+            except Exception as e:
+                errors[c] = e
+    return results, errors
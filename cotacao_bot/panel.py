@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+# — Painel alinhado entre moedas e correlação/covariância móveis vetorizadas —
+GRIDS = {"Dia": "D", "Boletim": "h"}
+
+
+def aligned_panel(df, daily_stats, quote_type, grid="Dia"):
+    """
+    Coloca todas as moedas numa grade comum (uma coluna por moeda). Na grade
+    diária usa o fechamento de cada dia; na de boletins, a última cotação de
+    cada hora. Lacunas isoladas são preenchidas com o último valor conhecido.
+    """
+    if grid == "Dia":
+        if daily_stats.empty:
+            return pd.DataFrame()
+        panel = daily_stats.pivot(index="Dia", columns="Moeda", values=f"{quote_type}_Final")
+    else:
+        if df.empty:
+            return pd.DataFrame()
+        slots = df["dataHoraCotacao"].dt.floor(GRIDS[grid])
+        panel = (df.assign(Slot=slots)
+                   .groupby(["Slot", "Moeda"], observed=True)[f"cotacao{quote_type}"].last()
+                   .unstack("Moeda"))
+    panel.columns = panel.columns.astype(str)
+    return panel.sort_index().ffill(limit=1).dropna()
+
+
+def rolling_cov_corr(panel, window):
+    """
+    Covariância e correlação móveis dos retornos do painel para todas as
+    moedas de uma vez. Usa somas acumuladas de x e de x·xᵀ, então cada
+    janela custa O(N²) independentemente do tamanho da janela.
+    Devolve (datas, cov[T, N, N], corr[T, N, N]).
+    """
+    returns = panel.pct_change().dropna()
+    x = returns.to_numpy(dtype=np.float64)
+    t, n = x.shape
+    if t < window or window < 2:
+        empty = np.empty((0, n, n))
+        return returns.index[:0], empty, empty
+    # Centralizar reduz o cancelamento numérico nas somas acumuladas
+    x = x - x.mean(axis=0)
+    s1 = np.concatenate([np.zeros((1, n)), np.cumsum(x, axis=0)])
+    s2 = np.concatenate([np.zeros((1, n, n)), np.cumsum(x[:, :, None] * x[:, None, :], axis=0)])
+    sum_x = s1[window:] - s1[:-window]
+    sum_xx = s2[window:] - s2[:-window]
+    cov = (sum_xx - sum_x[:, :, None] * sum_x[:, None, :] / window) / (window - 1)
+    std = np.sqrt(np.clip(np.diagonal(cov, axis1=1, axis2=2), 0, None))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / (std[:, :, None] * std[:, None, :])
+    return returns.index[window - 1:], cov, np.clip(corr, -1, 1)
+
+
+def pair_series(dates, matrices, columns):
+    """Séries temporais de cada par (i < j) a partir das matrizes móveis"""
+    i, j = np.triu_indices(len(columns), k=1)
+    data = matrices[:, i, j]
+    names = [f"{columns[a]}/{columns[b]}" for a, b in zip(i, j)]
+    return pd.DataFrame(data, index=dates, columns=names)
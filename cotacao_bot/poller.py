@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from quote_cache import quote_cache
+
+# — Monitor dos boletins intradiários (um por processo) —
+POLL_SECONDS = int(os.environ.get("PTAX_POLL_SECONDS", "60"))
+# Moedas deixam de ser monitoradas se nenhuma sessão as pedir nesse intervalo
+WATCH_TTL = 30 * 60
+
+
+class BulletinPoller:
+    """
+    Thread única por processo que, a cada POLL_SECONDS, consulta só a janela
+    do dia corrente das moedas em uso e injeta os boletins novos no
+    quote_cache. Os fragmentos do dashboard comparam quote_cache.version()
+    para saber se há algo novo a desenhar.
+    """
+
+    def __init__(self, cache=quote_cache, interval=POLL_SECONDS):
+        self.cache = cache
+        self.interval = interval
+        self.last_poll = None
+        self._watched = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, codes):
+        """Registra as moedas exibidas por uma sessão e garante a thread ativa"""
+        now = time.monotonic()
+        with self._lock:
+            for c in codes:
+                self._watched[c] = now
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="ptax-poller")
+                self._thread.start()
+
+    def _codes(self):
+        now = time.monotonic()
+        with self._lock:
+            self._watched = {c: t for c, t in self._watched.items() if now - t < WATCH_TTL}
+            return list(self._watched)
+
+    def poll_once(self):
+        """Atualiza o dia corrente das moedas monitoradas; devolve {moeda: novas}"""
+        new = {}
+        for code in self._codes():
+            added = self.cache.refresh_today(code)
+            if added:
+                new[code] = added
+        self.last_poll = datetime.now()
+        return new
+
+    def _run(self):
+        while True:
+            # Não há boletins PTAX nos fins de semana
+            if datetime.now().weekday() < 5:
+                self.poll_once()
+            time.sleep(self.interval)
+
+
+poller = BulletinPoller()
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pandas as pd
+
+from olinda import as_date, fetch_windows
+from schema import to_canonical
+
+# — Armazenamento local das cotações (Parquet por moeda/mês) —
+STORE_DIR = os.environ.get(
+    "PTAX_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ptax")
+)
+SYNC_FILE = "_sync.json"
+
+
+def merge_intervals(intervals):
+    """Une intervalos de dias [inicio, fim] sobrepostos ou adjacentes"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_intervals(intervals, start, end):
+    """Retorna os trechos de [start, end] não cobertos pelos intervalos"""
+    gaps = []
+    cursor = start
+    for s, e in merge_intervals(intervals):
+        if e < cursor:
+            continue
+        if s > end:
+            break
+        if s > cursor:
+            gaps.append((cursor, s - timedelta(days=1)))
+        cursor = max(cursor, e + timedelta(days=1))
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def month_starts(start, end):
+    """Lista o primeiro dia de cada mês entre start e end"""
+    months = []
+    current = start.replace(day=1)
+    while current <= end:
+        months.append(current)
+        current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return months
+
+
+class QuoteStore:
+    """
+    Guarda as cotações em disco, particionadas por moeda e mês
+    (<raiz>/<MOEDA>/<AAAA-MM>.parquet), e registra em _sync.json os dias
+    já sincronizados. Só consulta a API para os dias que ainda não possui;
+    o dia corrente nunca é marcado como sincronizado, pois novos boletins
+    ainda podem ser publicados. Cada janela baixada é gravada e marcada
+    assim que chega, então uma sincronização interrompida recomeça da
+    janela que falhou.
+    """
+
+    def __init__(self, root=STORE_DIR, fetch=fetch_windows):
+        self.root = root
+        self.fetch = fetch
+        self._locks = defaultdict(threading.RLock)
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, code):
+        # Um lock por moeda: moedas diferentes podem sincronizar em paralelo
+        with self._locks_guard:
+            return self._locks[code]
+
+    def _currency_dir(self, code):
+        return os.path.join(self.root, code)
+
+    def _partition_path(self, code, month):
+        return os.path.join(self._currency_dir(code), f"{month:%Y-%m}.parquet")
+
+    def synced_intervals(self, code):
+        path = os.path.join(self._currency_dir(code), SYNC_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        return [[date.fromisoformat(s), date.fromisoformat(e)] for s, e in raw]
+
+    def _save_synced(self, code, intervals):
+        path = os.path.join(self._currency_dir(code), SYNC_FILE)
+        raw = [[s.isoformat(), e.isoformat()] for s, e in merge_intervals(intervals)]
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(raw, f)
+        os.replace(tmp, path)
+
+    def _write(self, code, df):
+        """Mescla as novas cotações nas partições mensais existentes"""
+        os.makedirs(self._currency_dir(code), exist_ok=True)
+        months = df["dataHoraCotacao"].dt.to_period("M")
+        for period, part in df.groupby(months):
+            path = self._partition_path(code, period.to_timestamp())
+            if os.path.exists(path):
+                part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+            keys = [c for c in ("dataHoraCotacao", "tipoBoletim") if c in part.columns]
+            part = (part.drop_duplicates(subset=keys, keep="last")
+                        .sort_values("dataHoraCotacao")
+                        .reset_index(drop=True))
+            tmp = path + ".tmp"
+            part.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+
+    def sync(self, code, start_date, end_date):
+        """Busca na API apenas os dias do período ainda não sincronizados"""
+        start_date, end_date = as_date(start_date), as_date(end_date)
+        today = date.today()
+        with self._lock(code):
+            synced = self.synced_intervals(code)
+            for gap_start, gap_end in missing_intervals(synced, start_date, end_date):
+                for (win_start, win_end), fetched in self.fetch(code, gap_start, gap_end):
+                    if not fetched.empty:
+                        self._write(code, fetched)
+                    closed_end = min(win_end, today - timedelta(days=1))
+                    if closed_end >= win_start:
+                        synced.append([win_start, closed_end])
+                        os.makedirs(self._currency_dir(code), exist_ok=True)
+                        self._save_synced(code, synced)
+
+    def read(self, code, start_date, end_date):
+        """Lê do disco as cotações do período, sem acessar a API"""
+        start_date, end_date = as_date(start_date), as_date(end_date)
+        frames = []
+        for month in month_starts(start_date, end_date):
+            path = self._partition_path(code, month)
+            if os.path.exists(path):
+                frames.append(pd.read_parquet(path))
+        if not frames:
+            return pd.DataFrame()
+        df = to_canonical(pd.concat(frames, ignore_index=True))
+        df = df[(df["Dia"] >= pd.Timestamp(start_date)) & (df["Dia"] <= pd.Timestamp(end_date))]
+        return df.reset_index(drop=True)
+
+    def get(self, code, start_date, end_date):
+        """Sincroniza o que falta e devolve as cotações do período"""
+        self.sync(code, start_date, end_date)
+        return self.read(code, start_date, end_date)
+
+
+store = QuoteStore()
@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from daily import daily_aggregates
+from frame_cache import FrameCache
+from olinda import as_date
+from ptax_store import merge_intervals, missing_intervals, store
+
+# — Cache em memória por moeda e intervalos de dias —
+# Dias encerrados nunca mudam; apenas o dia corrente expira após TODAY_TTL segundos
+TODAY_TTL = int(os.environ.get("PTAX_TODAY_TTL", "300"))
+QUOTE_CACHE_MB = int(os.environ.get("PTAX_QUOTE_CACHE_MB", "256"))
+
+
+def merge_frames(current, df):
+    """Incorpora novas linhas ao frame da moeda, descartando repetidas"""
+    frames = [f for f in (current, df) if f is not None and not f.empty]
+    if not frames:
+        return current
+    merged = pd.concat(frames, ignore_index=True)
+    keys = [c for c in ("dataHoraCotacao", "tipoBoletim") if c in merged.columns]
+    merged = merged.drop_duplicates(subset=keys, keep="last")
+    return merged.sort_values("dataHoraCotacao", kind="stable").reset_index(drop=True)
+
+
+class IntervalQuoteCache:
+    """
+    Mantém, por moeda, um único DataFrame ordenado com todos os dias já
+    carregados e a lista de intervalos cobertos. Um período qualquer é
+    respondido a partir dos segmentos em cache, buscando só as lacunas.
+    As entradas (frame, intervalos, carga de hoje) ficam num FrameCache,
+    que descarta moedas inteiras quando o orçamento de memória estoura.
+
+    Quando o dia corrente expira e já existe dado em cache, ele é servido
+    na hora e atualizado em segundo plano (stale-while-revalidate). Se a
+    API falhar, usa o que houver em disco (fallback) e registra o erro em
+    status() para que a interface mostre a defasagem.
+
+    Os ouvintes em `listeners` recebem (moeda, cotações) a cada carga nova,
+    sempre com dias completos, para manter agregados incrementais.
+    """
+
+    def __init__(self, loader=store.get, fallback=store.read, today_ttl=TODAY_TTL,
+                 max_bytes=QUOTE_CACHE_MB * 1024 * 1024):
+        self.loader = loader
+        self.fallback = fallback
+        self.today_ttl = today_ttl
+        self.entries = FrameCache(max_bytes, name="cotações")
+        self._refreshed_at = {}
+        self._errors = {}
+        self._refreshing = set()
+        self.listeners = []
+        self._versions = {}
+        self._locks = defaultdict(threading.RLock)
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, code):
+        with self._locks_guard:
+            return self._locks[code]
+
+    @staticmethod
+    def _slice(df, start_date, end_date):
+        if df is None or df.empty:
+            return pd.DataFrame()
+        times = df["dataHoraCotacao"].values
+        lo = times.searchsorted(pd.Timestamp(start_date).to_datetime64(), side="left")
+        hi = times.searchsorted(pd.Timestamp(end_date + timedelta(days=1)).to_datetime64(), side="left")
+        return df.iloc[lo:hi].copy()
+
+    def _load(self, code, start_date, end_date):
+        """Carrega da API via loader; em falha, devolve o que houver em disco"""
+        try:
+            df = self.loader(code, start_date, end_date)
+            ok = True
+            self._errors.pop(code, None)
+        except Exception as e:
+            self._errors[code] = e
+            df = self.fallback(code, start_date, end_date) if self.fallback else pd.DataFrame()
+            if df.empty:
+                raise
+            ok = False
+        for listener in self.listeners:
+            listener(code, df)
+        return df, ok
+
+    def refresh_today(self, code):
+        """
+        Recarrega o dia corrente e incorpora à entrada atual da moeda.
+        Devolve quantas cotações novas chegaram (0 em caso de falha).
+        """
+        today = date.today()
+        with self._lock(code):
+            try:
+                df, ok = self._load(code, today, today)
+            except Exception:
+                return 0
+            frame, intervals, today_loaded = self.entries.get(code, (None, [], None))
+            before = 0 if frame is None else len(frame)
+            frame = merge_frames(frame, df)
+            if ok:
+                today_loaded = time.monotonic()
+                self._refreshed_at[code] = datetime.now()
+            self.entries.put(code, (frame, intervals, today_loaded))
+            added = (0 if frame is None else len(frame)) - before
+            if added > 0:
+                self._bump(code)
+            return added
+
+    def _bump(self, code):
+        with self._locks_guard:
+            self._versions[code] = self._versions.get(code, 0) + 1
+
+    def version(self, codes):
+        """Versão dos dados das moedas: muda sempre que chegam cotações novas"""
+        with self._locks_guard:
+            return tuple(self._versions.get(c, 0) for c in codes)
+
+    def _refresh_in_background(self, code):
+        with self._locks_guard:
+            if code in self._refreshing:
+                return
+            self._refreshing.add(code)
+
+        def run():
+            try:
+                self.refresh_today(code)
+            finally:
+                with self._locks_guard:
+                    self._refreshing.discard(code)
+
+        threading.Thread(target=run, daemon=True, name=f"ptax-refresh-{code}").start()
+
+    def get(self, code, start_date, end_date):
+        """Devolve as cotações do período, buscando apenas os dias ausentes"""
+        start_date, end_date = as_date(start_date), as_date(end_date)
+        today = date.today()
+        with self._lock(code):
+            frame, intervals, today_loaded = self.entries.get(code, (None, [], None))
+            changed = False
+            closed_end = min(end_date, today - timedelta(days=1))
+            if start_date <= closed_end:
+                for gap_start, gap_end in missing_intervals(intervals, start_date, closed_end):
+                    df, ok = self._load(code, gap_start, gap_end)
+                    frame = merge_frames(frame, df)
+                    if ok:
+                        intervals = merge_intervals(intervals + [[gap_start, gap_end]])
+                    changed = True
+            if end_date >= today:
+                expired = today_loaded is None or time.monotonic() - today_loaded > self.today_ttl
+                if expired and today_loaded is not None:
+                    self._refresh_in_background(code)
+                elif expired:
+                    df, ok = self._load(code, today, today)
+                    frame = merge_frames(frame, df)
+                    if ok:
+                        today_loaded = time.monotonic()
+                        self._refreshed_at[code] = datetime.now()
+                    changed = True
+            if changed:
+                self.entries.put(code, (frame, intervals, today_loaded))
+                self._bump(code)
+            return self._slice(frame, start_date, end_date)
+
+    def status(self, code):
+        """(horário da última atualização bem-sucedida de hoje, último erro da API)"""
+        return self._refreshed_at.get(code), self._errors.get(code)
+
+    def clear(self):
+        self.entries.clear()
+
+
+quote_cache = IntervalQuoteCache()
+quote_cache.listeners.append(daily_aggregates.update)
@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from mail_queue import mail_queue
+from mailer import render_report
+from metrics import compute_metrics, email_table
+from monthly_average import monthly_averages
+from olinda import fetch_many
+from quote_cache import quote_cache
+from scheduler import scheduler
+from subscriptions import SUBSCRIPTION_REPORT, subscriptions
+
+# — Relatórios enviados pelo agendador (rodam fora de qualquer sessão) —
+# Tempo máximo que o job espera a fila confirmar os envios
+SEND_TIMEOUT = 10 * 60
+
+
+def load_quotes(codes, start_date, end_date, loaded=None):
+    """
+    Cotações das moedas no período, pelo cache por intervalos. `loaded`
+    guarda, por (moeda, início, fim), o frame ou a exceção de cada busca,
+    de modo que uma moeda já carregada não é buscada de novo. Levanta
+    RuntimeError se alguma moeda falhar, para que o relatório não saia
+    sem ela.
+    """
+    loaded = {} if loaded is None else loaded
+    missing = [c for c in codes if (c, start_date, end_date) not in loaded]
+    if missing:
+        results, errors = fetch_many(quote_cache.get, missing, start_date, end_date)
+        for c in missing:
+            loaded[(c, start_date, end_date)] = errors[c] if c in errors else results[c]
+    parts = {c: loaded[(c, start_date, end_date)] for c in codes}
+    errors = {c: part for c, part in parts.items() if isinstance(part, Exception)}
+    if errors:
+        detail = "; ".join(f"{c}: {e}" for c, e in errors.items())
+        raise RuntimeError(f"Falha ao buscar cotações ({detail})")
+    frames = [part for part in parts.values() if not part.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def calculate_monthly_average(df):
+    """
+    Média mensal PTAX (fechamentos diários, truncada) do mês corrente
+    para cada moeda, com as colunas de compra e venda do e-mail
+    """
+    if df.empty:
+        return pd.DataFrame()
+    
+    # Filtra apenas dados do mês atual (sem criar colunas no frame compartilhado)
+    month_start = pd.Timestamp.now().normalize().replace(day=1)
+    month_data = df[df['Dia'] >= month_start]
+    
+    if month_data.empty:
+        return pd.DataFrame()
+    
+    return monthly_averages(month_data)[["Moeda", "Compra", "Venda"]].rename(columns={
+        'Compra': 'Média Compra (R$)',
+        'Venda': 'Média Venda (R$)'
+    })
+
+
+def build_report(report_definition, quotes_for):
+    """
+    (assunto, corpo HTML) de uma definição de relatório, ou (assunto, None)
+    sem dados. quotes_for(moedas, início, fim) fornece as cotações.
+    """
+    report, codes, side, days = report_definition
+    today = date.today()
+    if report == "Média mensal":
+        subject = f"Relatório Mensal PTAX - {today.strftime('%m/%Y')}"
+        table = calculate_monthly_average(quotes_for(codes, today.replace(day=1), today))
+        text = "Médias das cotações PTAX no mês corrente."
+    else:
+        subject = f"Relatório PTAX - {today.strftime('%d/%m/%Y')}"
+        table = email_table(compute_metrics(quotes_for(codes, today - timedelta(days=days), today)), side)
+        text = f"Relatório automático de cotações PTAX ({side.lower()}, últimos {days} dia(s))."
+    if table.empty:
+        return subject, None
+    return subject, render_report(table, subject, text)
+
+
+@scheduler.task(SUBSCRIPTION_REPORT)
+def send_subscriptions(schedule):
+    """
+    Job de cada cron com assinantes: cada definição distinta é calculada
+    e renderizada uma vez e enfileirada para todos os seus destinatários.
+    Cada moeda é buscada uma vez por período, mesmo que apareça em várias
+    definições. Definições cujas cotações falharam não são enviadas, e o
+    erro vai para o status do job depois que as demais forem enfileiradas.
+    """
+    loaded = {}
+
+    def quotes_for(codes, start_date, end_date):
+        return load_quotes(codes, start_date, end_date, loaded)
+
+    jobs, load_errors = [], []
+    for report_definition, recipients in subscriptions.groups(schedule).items():
+        try:
+            subject, body = build_report(report_definition, quotes_for)
+        except Exception as e:
+            load_errors.append(e)
+            continue
+        if body is not None:
+            jobs.append(mail_queue.submit(recipients, subject, body))
+
+    # Espera a fila para que falhas apareçam no status do job agendado
+    failed = []
+    for job in jobs:
+        if not job.wait(SEND_TIMEOUT):
+            raise TimeoutError("Envio não confirmado pela fila de e-mails")
+        failed.extend(job.failed)
+    problems = []
+    if failed:
+        problems.append(f"{len(failed)} envio(s) falharam; último erro: {failed[-1][1]}")
+    if load_errors:
+        problems.append(f"{len(load_errors)} relatório(s) não enviados; último erro: {load_errors[-1]}")
+    if problems:
+        raise RuntimeError(" | ".join(problems))
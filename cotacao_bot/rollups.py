@@ -0,0 +1,103 @@
+import threading
+
+import pandas as pd
+
+from daily import daily_aggregates, upsert_rows
+from schema import CURRENCIES, categorical
+
+# — Pirâmide de agregações (semana, mês, trimestre, ano) sobre os agregados diários —
+LEVELS = {
+    "Semanal": "W",
+    "Mensal": "M",
+    "Trimestral": "Q",
+    "Anual": "Y",
+}
+ROLLUP_COLUMNS = [f"{t}_{s}" for t in ["Compra", "Venda"]
+                  for s in ["Inicial", "Final", "Min", "Max", "Media", "Var"]] + ["Dias"]
+
+
+def rollup(daily, freq):
+    """Agrega linhas diárias (índice Dia) em períodos OHLC + média; índice Periodo"""
+    periods = daily.index.to_period(freq).start_time
+    grouped = daily.groupby(periods)
+    result = pd.DataFrame(index=grouped.size().index)
+    for t in ["Compra", "Venda"]:
+        result[f"{t}_Inicial"] = grouped[f"{t}_Inicial"].first()
+        result[f"{t}_Final"] = grouped[f"{t}_Final"].last()
+        result[f"{t}_Min"] = grouped[f"{t}_Min"].min()
+        result[f"{t}_Max"] = grouped[f"{t}_Max"].max()
+        result[f"{t}_Media"] = grouped[f"{t}_Media"].mean()
+        result[f"{t}_Var"] = (result[f"{t}_Final"] - result[f"{t}_Inicial"]) / result[f"{t}_Inicial"] * 100
+    result["Dias"] = grouped.size()
+    result.index.name = "Periodo"
+    return result
+
+
+class RollupPyramid:
+    """
+    Agregações materializadas por moeda e nível, construídas a partir do
+    DailyAggregates. A cada dia atualizado, apenas os períodos que o contêm
+    são recalculados, então uma visão de 10 anos lê poucas centenas de
+    linhas já prontas.
+    """
+
+    def __init__(self, daily=daily_aggregates):
+        self.daily = daily
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def on_days_updated(self, code, days):
+        days = pd.DatetimeIndex(days)
+        # Os anos afetados contêm todos os períodos afetados dos demais níveis
+        span_start = days.min().to_period("Y").start_time
+        span_end = days.max().to_period("Y").end_time
+        current_daily = self.daily.between(code, span_start, span_end)
+        if current_daily is None or current_daily.empty:
+            return
+        updates = {}
+        for level, freq in LEVELS.items():
+            affected = days.to_period(freq).unique()
+            rows = current_daily[current_daily.index.to_period(freq).isin(affected)]
+            updates[level] = rollup(rows, freq)
+        with self._lock:
+            for level, new in updates.items():
+                self._frames[(code, level)] = upsert_rows(self._frames.get((code, level)), new)
+
+    def get(self, codes, level, start_date, end_date):
+        """
+        Períodos do nível que se sobrepõem a [start_date, end_date], por moeda.
+        Os períodos inteiramente dentro do intervalo vêm prontos; os das pontas
+        que o intervalo corta são recalculados só com os dias selecionados, de
+        modo que o resultado não depende do que outras sessões já carregaram.
+        """
+        freq = LEVELS[level]
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        first, last = start.to_period(freq), end.to_period(freq)
+        # [lo, hi): inícios dos períodos cobertos por inteiro
+        lo = first.start_time if start == first.start_time else (first + 1).start_time
+        hi = (last + 1).start_time if end == last.end_time.normalize() else last.start_time
+        frames = []
+        for code in codes:
+            with self._lock:
+                current = self._frames.get((code, level))
+                inner = None if current is None else current[(current.index >= lo) & (current.index < hi)]
+            parts = [] if inner is None or inner.empty else [inner]
+            edges = self.daily.between(code, start, end)
+            if edges is not None:
+                edges = edges[(edges.index < lo) | (edges.index >= hi)]
+                if not edges.empty:
+                    parts.append(rollup(edges, freq))
+            if not parts:
+                continue
+            part = pd.concat(parts).sort_index().reset_index()
+            part.insert(0, "Moeda", code)
+            frames.append(part)
+        if not frames:
+            return pd.DataFrame()
+        result = pd.concat(frames, ignore_index=True)
+        result["Moeda"] = categorical(result["Moeda"], CURRENCIES)
+        return result[["Moeda", "Periodo"] + ROLLUP_COLUMNS]
+
+
+rollups = RollupPyramid()
+daily_aggregates.listeners.append(rollups.on_days_updated)
@@ -0,0 +1,167 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+# — Agendador único por processo para os envios automáticos —
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+JOBS_FILE = os.environ.get("PTAX_JOBS_FILE", os.path.join(DATA_DIR, "jobs.json"))
+# Formato crontab de 5 campos; dias da semana por nome (mon-fri), pois no
+# APScheduler 0 é segunda-feira
+DAILY_EMAIL_CRON = os.environ.get("PTAX_DAILY_EMAIL_CRON", "0 9 * * *")
+# Atraso tolerado para um disparo perdido (ex.: processo ocupado ou reiniciando)
+MISFIRE_GRACE = 15 * 60
+# Marcadores de execução mais antigos que isso são apagados
+RUN_MARKER_TTL = 7 * 24 * 3600
+
+
+def parse_cron(expr):
+    """Valida e converte uma expressão crontab (erro claro se for inválida)"""
+    try:
+        return CronTrigger.from_crontab(expr)
+    except ValueError as e:
+        raise ValueError(f"Agendamento inválido '{expr}': {e}") from e
+
+
+class JobScheduler:
+    """
+    Um BackgroundScheduler por processo, que dorme até o próximo horário
+    devido (sem polling). As definições dos jobs (tarefa, cron, parâmetros)
+    ficam em JOBS_FILE e são recarregadas na inicialização, então sobrevivem
+    a reinícios e ao fechamento das abas.
+
+    Cada disparo é reivindicado criando, com O_EXCL, um marcador
+    <job>@<horário agendado> ao lado do arquivo de jobs: mesmo com vários
+    processos ou reexecuções, cada job roda no máximo uma vez por horário.
+    """
+
+    def __init__(self, path=JOBS_FILE):
+        self.path = path
+        self.runs_dir = os.path.join(os.path.dirname(path), "runs")
+        self.tasks = {}
+        self.last_runs = {}
+        self._lock = threading.Lock()
+        self._scheduler = BackgroundScheduler(job_defaults={
+            "coalesce": True,
+            "max_instances": 1,
+            "misfire_grace_time": MISFIRE_GRACE,
+        })
+
+    def task(self, kind):
+        """Decorador que registra a função executada pelos jobs do tipo `kind`"""
+        def decorator(func):
+            self.tasks[kind] = func
+            return func
+        return decorator
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, jobs):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(jobs, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def _schedule(self, job_id, job):
+        self._scheduler.add_job(self._run, parse_cron(job["cron"]), args=[job_id],
+                                id=job_id, replace_existing=True)
+
+    def start(self):
+        """Inicia o agendador (idempotente) e recarrega os jobs persistidos"""
+        with self._lock:
+            if self._scheduler.running:
+                return
+            for job_id, job in self._load().items():
+                try:
+                    self._schedule(job_id, job)
+                except ValueError as e:
+                    self.last_runs[job_id] = (None, e)
+            self._scheduler.start()
+
+    def add(self, job_id, kind, cron, **params):
+        """Cria ou substitui um job persistente"""
+        if kind not in self.tasks:
+            raise KeyError(f"Tarefa desconhecida: {kind}")
+        job = {"kind": kind, "cron": cron, "params": params}
+        with self._lock:
+            self._schedule(job_id, job)
+            jobs = self._load()
+            jobs[job_id] = job
+            self._save(jobs)
+
+    def remove(self, job_id):
+        with self._lock:
+            jobs = self._load()
+            jobs.pop(job_id, None)
+            self._save(jobs)
+            if self._scheduler.get_job(job_id):
+                self._scheduler.remove_job(job_id)
+
+    def jobs(self):
+        """Definições persistidas de todos os jobs ({id: job})"""
+        return self._load()
+
+    def get(self, job_id):
+        """
+        Definição do job com o próximo horário de execução e a última
+        execução (horário, erro) deste processo, ou None se não existir.
+        """
+        job = self._load().get(job_id)
+        if job is None:
+            return None
+        scheduled = self._scheduler.get_job(job_id)
+        return dict(job, next_run=scheduled.next_run_time if scheduled else None,
+                    last_run=self.last_runs.get(job_id))
+
+    @staticmethod
+    def _due_time(job, now):
+        """Horário agendado do disparo atual (o último <= now dentro da tolerância)"""
+        trigger = parse_cron(job["cron"])
+        due = trigger.get_next_fire_time(None, now - timedelta(seconds=MISFIRE_GRACE))
+        while due is not None:
+            following = trigger.get_next_fire_time(due, due + timedelta(seconds=1))
+            if following is None or following > now:
+                break
+            due = following
+        return due if due is not None and due <= now else now
+
+    def _claim(self, job_id, due):
+        """Cria o marcador do disparo; False se ele já foi executado"""
+        os.makedirs(self.runs_dir, exist_ok=True)
+        for name in os.listdir(self.runs_dir):
+            path = os.path.join(self.runs_dir, name)
+            if time.time() - os.path.getmtime(path) > RUN_MARKER_TTL:
+                os.remove(path)
+        safe_id = re.sub(r"[^\w@.-]", "_", job_id)
+        marker = os.path.join(self.runs_dir, f"{safe_id}@{due:%Y%m%d%H%M}")
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def _run(self, job_id):
+        job = self._load().get(job_id)
+        if job is None:
+            return
+        now = datetime.now().astimezone()
+        if not self._claim(job_id, self._due_time(job, now)):
+            return
+        try:
+            self.tasks[job["kind"]](**job["params"])
+            self.last_runs[job_id] = (now, None)
+        except Exception as e:
+            self.last_runs[job_id] = (now, e)
+
+
+scheduler = JobScheduler()
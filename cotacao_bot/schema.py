@@ -0,0 +1,42 @@
+import os
+
+import pandas as pd
+
+# — Esquema canônico do DataFrame de cotações —
+CURRENCIES = ["USD", "EUR", "GBP", "JPY", "CHF", "AUD", "CAD"]
+BULLETINS = ["Abertura", "Intermediário", "Fechamento"]
+PRICE_COLUMNS = ["cotacaoCompra", "cotacaoVenda", "paridadeCompra", "paridadeVenda"]
+# Colunas float com backend Arrow (opcional; o padrão é float64 do NumPy)
+ARROW_FLOATS = os.environ.get("PTAX_ARROW_FLOATS", "0") == "1"
+
+
+
+def categorical(values, known):
+    """Categórico com as categorias fixas conhecidas (mais eventuais novas)"""
+    values = values.astype(str)
+    extra = sorted(set(values.unique()) - set(known))
+    return values.astype(pd.CategoricalDtype(known + extra))
+
+
+def to_canonical(df, code=None):
+    """
+    Converte o frame de cotações para o esquema compacto: Moeda e tipoBoletim
+    categóricos, dataHoraCotacao em datetime64, Dia como datetime64 truncado
+    no dia e preços em float. Nenhuma coluna fica como object.
+    """
+    if df.empty:
+        return df
+    if code is not None:
+        df["Moeda"] = code
+    if not isinstance(df["Moeda"].dtype, pd.CategoricalDtype):
+        df["Moeda"] = categorical(df["Moeda"], CURRENCIES)
+    if not pd.api.types.is_datetime64_dtype(df["dataHoraCotacao"]):
+        df["dataHoraCotacao"] = pd.to_datetime(df["dataHoraCotacao"])
+    df["Dia"] = df["dataHoraCotacao"].dt.normalize()
+    if "tipoBoletim" in df.columns and not isinstance(df["tipoBoletim"].dtype, pd.CategoricalDtype):
+        df["tipoBoletim"] = categorical(df["tipoBoletim"], BULLETINS)
+    float_dtype = "float64[pyarrow]" if ARROW_FLOATS else "float64"
+    for col in PRICE_COLUMNS:
+        if col in df.columns and df[col].dtype != float_dtype:
+            df[col] = df[col].astype(float_dtype)
+    return df
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+
+from scheduler import DATA_DIR, parse_cron, scheduler
+
+# — Assinaturas de relatórios por e-mail (persistentes, fora das sessões) —
+SUBSCRIPTIONS_FILE = os.environ.get("PTAX_SUBSCRIPTIONS_FILE", os.path.join(DATA_DIR, "subscriptions.json"))
+SUBSCRIPTION_REPORT = "assinaturas"
+REPORTS = ["Indicadores", "Média mensal"]
+# Janela do relatório de indicadores (dias até a data do envio)
+PERIOD_DAYS = {"Último dia": 1, "Última semana": 7, "Últimos 30 dias": 30}
+
+
+def definition(sub):
+    """Chave da definição do relatório: assinantes com a mesma chave recebem o mesmo e-mail"""
+    # A média mensal cobre sempre o mês corrente e traz compra e venda;
+    # nem o período nem o lado da cotação a diferenciam
+    if sub["report"] == "Média mensal":
+        return (sub["report"], tuple(sub["codes"]), None, None)
+    return (sub["report"], tuple(sub["codes"]), sub["side"], sub["days"])
+
+
+class SubscriptionRegistry:
+    """
+    Guarda em SUBSCRIPTIONS_FILE, por destinatário, o relatório assinado
+    (tipo, moedas, lado da cotação, período) e o agendamento em cron.
+    Cada cron distinto vira um único job no agendador; a cada disparo,
+    groups(cron) reúne os assinantes por definição idêntica, de modo que
+    cada relatório distinto é calculado e renderizado uma só vez.
+    """
+
+    def __init__(self, path=SUBSCRIPTIONS_FILE, scheduler=scheduler):
+        self.path = path
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, subs):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(subs, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def _sync_jobs(self, subs):
+        """Um job por cron em uso; jobs de crons sem assinantes são removidos"""
+        crons = {s["cron"] for s in subs.values()}
+        for cron in crons:
+            self.scheduler.add(f"{SUBSCRIPTION_REPORT}:{cron}", SUBSCRIPTION_REPORT, cron, schedule=cron)
+        for job_id, job in self.scheduler.jobs().items():
+            if job["kind"] == SUBSCRIPTION_REPORT and job["params"]["schedule"] not in crons:
+                self.scheduler.remove(job_id)
+
+    def subscribe(self, email, report, codes, side, days, cron):
+        """Cria a assinatura (idempotente) e devolve o seu id"""
+        parse_cron(cron)
+        sub = {
+            "email": email.strip().lower(),
+            "report": report,
+            "codes": sorted(codes),
+            "side": side,
+            "days": int(days),
+            "cron": cron,
+        }
+        raw = json.dumps([sub[k] for k in ("email", "report", "codes", "side", "days", "cron")])
+        sub_id = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+        with self._lock:
+            subs = self._load()
+            subs[sub_id] = sub
+            self._save(subs)
+            self._sync_jobs(subs)
+        return sub_id
+
+    def unsubscribe(self, sub_id):
+        with self._lock:
+            subs = self._load()
+            subs.pop(sub_id, None)
+            self._save(subs)
+            self._sync_jobs(subs)
+
+    def of(self, email):
+        """Assinaturas de um destinatário ({id: assinatura})"""
+        email = email.strip().lower()
+        return {k: s for k, s in self._load().items() if s["email"] == email}
+
+    def count(self):
+        return len(self._load())
+
+    def groups(self, cron):
+        """Destinatários por definição de relatório, para as assinaturas do cron"""
+        groups = defaultdict(list)
+        for sub in self._load().values():
+            if sub["cron"] == cron:
+                groups[definition(sub)].append(sub["email"])
+        return dict(groups)
+
+
+subscriptions = SubscriptionRegistry()
@@ -0,0 +1,39 @@
+import math
+
+import numpy as np
+
+# — Tabela detalhada paginada no servidor (filtro, ordenação e página) —
+PAGE_SIZES = [50, 100, 500, 1000]
+
+
+def filter_rows(df, filters):
+    """
+    Mantém as linhas cujos valores estão nas listas de `filters`
+    ({coluna: valores}). Listas vazias ou None não filtram.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in filters.items():
+        if values and col in df.columns:
+            mask &= df[col].isin(values).to_numpy()
+    return df if mask.all() else df[mask]
+
+
+def page_count(n_rows, page_size):
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def page_rows(df, sort_by=None, ascending=True, page=1, page_size=PAGE_SIZES[0]):
+    """
+    Ordena (estável) e devolve só as linhas da página pedida, com os tipos
+    originais. Apenas esse recorte é enviado ao navegador.
+    Devolve (página, total de páginas).
+    """
+    pages = page_count(len(df), page_size)
+    page = min(max(page, 1), pages)
+    rows = slice((page - 1) * page_size, page * page_size)
+    if sort_by is not None and sort_by in df.columns:
+        # Posições ordenadas da coluna (estável, nulos no fim); só a página é materializada
+        keys = df[sort_by].reset_index(drop=True)
+        order = keys.sort_values(ascending=ascending, kind="stable").index.to_numpy()
+        return df.iloc[order[rows]].reset_index(drop=True), pages
+    return df.iloc[rows].reset_index(drop=True), pages
@@ -1,90 +1,104 @@
-import requests
-from datetime import datetime, timedelta
-from collections import OrderedDict
-import win32com.client
+"""
+Média mensal PTAX.
+
+    python ptaxMedio.py                          # envia o dólar médio do mês (último dia útil)
+    python ptaxMedio.py AAAA-MM [AAAA-MM] [MOEDAS]  # tabela de médias, ex.: 2005-01 2024-12 USD,EUR
+"""
+import os
+import sys
+from datetime import datetime
 import calendar
 import locale
 
-locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
-
-def truncate(number, decimals=0):
-    factor = 10 ** decimals
-    return int(number * factor) / factor
-
-def ultimo_dia_util(year, month):
-    last_day = calendar.monthrange(year, month)[1]
-    day = datetime(year, month, last_day)
-    while day.weekday() >= 5:
-        day -= timedelta(days=1)
-    return day
-
-today = datetime.now()
-year = today.year
-month = today.month
-last_day_month = calendar.monthrange(year, month)[1]
-ultimo_util = ultimo_dia_util(year, month)
-
-
-if today.date() != ultimo_util.date():
-    print("O script só pode rodar no último dia ÚTIL do mês.")
-    exit()
-
-data_inicio = datetime(year, month, 1)
-data_fim = datetime(year, month, last_day_month)
-inicio = data_inicio.strftime("%m-%d-%Y")
-fim = data_fim.strftime("%m-%d-%Y")
-
-if month == 12:
-    next_month = 1
-    next_year = year + 1
-else:
-    next_month = month + 1
-    next_year = year
-mes_seguinte = datetime(next_year, next_month, 1).strftime('%B').capitalize()
-titulo_email = f"Dólar Médio {year} - {mes_seguinte}"
-
-url = (
-    "https://olinda.bcb.gov.br/olinda/servico/PTAX/versao/v1/odata/"
-    "CotacaoDolarPeriodo(dataInicial=@dataInicial,dataFinalCotacao=@dataFinalCotacao)"
-    f"?@dataInicial='{inicio}'"
-    f"&@dataFinalCotacao='{fim}'"
-    "&$orderby=dataHoraCotacao desc"
-    "&$top=1000"
-    "&$format=json"
-)
-
-resp = requests.get(url)
-resp.raise_for_status()
-cotacoes = resp.json().get('value', [])
-unico_por_dia = OrderedDict()
-for registro in cotacoes:
-    dia = registro['dataHoraCotacao'][:10]
-    if dia not in unico_por_dia:
-        unico_por_dia[dia] = registro['cotacaoVenda']
-
-unico_por_dia = dict(sorted(unico_por_dia.items(), key=lambda x: x[0]))
-valores = list(unico_por_dia.values())
-media = truncate(sum(valores) / len(valores), 4)
-
-html = """
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "cotacao_bot"))
+from monthly_average import closing_quotes, last_business_day, monthly
+from ptax_store import store
+from schema import CURRENCIES
+
+
+def print_table(args):
+    start = pd.Timestamp(args[0])
+    end = pd.Timestamp(args[1]) if len(args) > 1 else start
+    codes = args[2].upper().split(",") if len(args) > 2 else CURRENCIES
+    table, errors = monthly.get(codes, start, end)
+    for code, e in errors.items():
+        print(f"Erro ao buscar dados para {code}: {e}")
+    if table.empty:
+        print("Nenhuma cotação encontrada para o período informado.")
+        return
+    table["Mes"] = table["Mes"].dt.strftime("%m/%Y")
+    print(table.to_string(index=False))
+
+
+def send_monthly_email():
+    import win32com.client
+
+    locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
+    today = datetime.now()
+    year = today.year
+    month = today.month
+
+    if today.date() != last_business_day(year, month):
+        print("O envio só pode rodar no último dia ÚTIL do mês.")
+        return
+
+    data_inicio = datetime(year, month, 1)
+    data_fim = datetime(year, month, calendar.monthrange(year, month)[1])
+
+    if month == 12:
+        next_month = 1
+        next_year = year + 1
+    else:
+        next_month = month + 1
+        next_year = year
+    mes_seguinte = datetime(next_year, next_month, 1).strftime('%B').capitalize()
+    titulo_email = f"Dólar Médio {year} - {mes_seguinte}"
+
+    medias, errors = monthly.get(["USD"], data_inicio, data_fim)
+    if errors or medias.empty:
+        print(f"Sem cotações do dólar para {month:02d}/{year}: {errors.get('USD', '')}")
+        return
+    media = medias["Venda"].iloc[0]
+
+    # Lê do armazenamento local; a API só é consultada para os dias faltantes
+    try:
+        cotacoes = store.get("USD", data_inicio, data_fim)
+    except Exception as e:
+        print(f"Erro ao buscar as cotações diárias do dólar: {e}")
+        return
+    if cotacoes.empty:
+        print(f"Sem cotações diárias do dólar para {month:02d}/{year}")
+        return
+    fechamentos = closing_quotes(cotacoes)
+
+    html = """
 <table style="border-collapse:collapse;font-family:Arial;font-size:13px;">
   <tr style="background-color:#efe4c6;">
     <th style="padding:5px 12px;">Data</th>
     <th style="padding:5px 12px;">Venda</th>
   </tr>
 """
-for dia, venda in unico_por_dia.items():
-    html += f'<tr style="background-color:#faf7ee;"><td style="padding:5px 12px;">{datetime.strptime(dia, "%Y-%m-%d").strftime("%d/%m/%Y")}</td><td style="padding:5px 12px;">{venda:.4f}</td></tr>'
-html += f"""<tr>
+    for dia, venda in zip(fechamentos["Dia"], fechamentos["cotacaoVenda"]):
+        html += f'<tr style="background-color:#faf7ee;"><td style="padding:5px 12px;">{dia.strftime("%d/%m/%Y")}</td><td style="padding:5px 12px;">{venda:.4f}</td></tr>'
+    html += f"""<tr>
     <td style="padding:5px 12px;font-weight:bold;background:#fffbe4;text-align:right;" colspan="1"></td>
     <td style="padding:5px 12px;font-weight:bold;background:#fffbe4;color:#ffce1a;font-size:16px;">{media:.4f}</td>
   </tr>
 </table>
 """
 
-outlook = win32com.client.Dispatch("Outlook.Application")
-mail = outlook.CreateItem(0)
-mail.To = "seu email"
-mail.Subject = titulo_email
-mail.HTMLBody = f"<h3>Cotações do Dólar PTAXa - {mes_seguinte} </h3>{html}"
-mail.Send()
+    outlook = win32com.client.Dispatch("Outlook.Application")
+    mail = outlook.CreateItem(0)
+    mail.To = "seu email"
+    mail.Subject = titulo_email
+    mail.HTMLBody = f"<h3>Cotações do Dólar PTAXa - {mes_seguinte} </h3>{html}"
+    mail.Send()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print_table(sys.argv[1:])
+    else:
+        send_monthly_email()